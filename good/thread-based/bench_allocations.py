@@ -0,0 +1,66 @@
+# Benchmark: memory and allocations per event on a replay, for the different record types,
+# and for one queue entry per observer vs. one queue entry shared by all the observers.
+#
+# The observers are not started, so that every event stays referenced from their queues;
+# tracemalloc then tells the memory blocks and bytes that each replayed event costs.
+#
+# Usage:
+#   python bench_allocations.py [number_of_events] [number_of_observers]
+
+import sys
+import time
+import tracemalloc
+
+from lib import Observable, SomeData, SlottedSomeData, FrozenSomeData
+
+
+class Replay(Observable):
+    generates_internal_events = False
+
+    def internal_generate_events(self):
+        pass
+
+    def handle_events(self, sender, eventData):
+        pass
+
+    def notify_observers_unshared(self, event):
+        """the former delivery path: each observer builds its own (sender, event) tuple."""
+        for observer in self.observers:
+            observer.notify(self, event)
+
+
+class Sink(Replay):
+    pass
+
+
+def run(record_type, shared, number_of_events, number_of_observers):
+    replay = Replay(name='replay')
+    for idx in range(number_of_observers):
+        Sink(name=f'sink{idx}').observe(replay)
+    notify = replay.notify_observers if shared else replay.notify_observers_unshared
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    start_time = time.perf_counter()
+    for idx in range(number_of_events):
+        notify(record_type(value=idx, source='replay'))
+    elapsed_time = time.perf_counter() - start_time
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    differences = after.compare_to(before, 'filename')
+    blocks = sum(difference.count_diff for difference in differences)
+    size = sum(difference.size_diff for difference in differences)
+    return blocks / number_of_events, size / number_of_events, number_of_events / elapsed_time
+
+
+if __name__ == '__main__':
+    number_of_events = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    number_of_observers = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    print(f'{number_of_events:,} events replayed to {number_of_observers} observers')
+
+    for record_type, shared in [(SomeData, False), (SomeData, True), (SlottedSomeData, True), (FrozenSomeData, True)]:
+        blocks, size, events_per_second = run(record_type, shared, number_of_events, number_of_observers)
+        entries = 'shared entry' if shared else 'entry per observer'
+        print(f'{record_type.__name__:16} {entries:19}: {blocks:5.2f} blocks/event, {size:7.1f} bytes/event, '
+              f'{events_per_second:10,.0f} events/sec (under tracemalloc)')
@@ -0,0 +1,161 @@
+# Benchmark: the same demo_01.py-style graphs on the thread backend, the shared scheduler, and the asyncio backend.
+# Each graph is a chain source -> step1 -> step2 -> step3 -> sink; we measure startup time and events/sec end-to-end.
+#
+# Usage:
+#   python bench_backends.py [number_of_chains] [events_per_chain]
+
+import asyncio
+import sys
+import threading
+import time
+
+from lib import Observable, ExampleProcessor, Scheduler
+from lib.aio import AsyncObservable, AsyncExampleProcessor
+from lib.datatypes import SomeData
+
+
+class Source(Observable):
+    generates_internal_events = False
+
+    def internal_generate_events(self):
+        pass
+
+    def handle_events(self, sender, eventData):
+        pass
+
+
+class CountingSink(Observable):
+    """counts the received events, and sets `done` once `expected` events arrived, over all the sinks."""
+    generates_internal_events = False
+    lock = threading.Lock()
+    received = 0
+    expected = 0
+    done = threading.Event()
+
+    def internal_generate_events(self):
+        pass
+
+    def handle_events(self, sender, eventData):
+        if eventData is Ellipsis and sender is self:
+            return
+        with CountingSink.lock:
+            CountingSink.received += 1
+            if CountingSink.received >= CountingSink.expected:
+                CountingSink.done.set()
+
+
+class AsyncSource(AsyncObservable):
+    generates_internal_events = False
+
+    async def handle_events(self, sender, eventData):
+        pass
+
+
+class AsyncCountingSink(AsyncObservable):
+    generates_internal_events = False
+    received = 0
+    expected = 0
+    done = None
+
+    async def handle_events(self, sender, eventData):
+        if eventData is Ellipsis and sender is self:
+            return
+        AsyncCountingSink.received += 1
+        if AsyncCountingSink.received >= AsyncCountingSink.expected:
+            AsyncCountingSink.done.set()
+
+
+def make_events(events_per_chain):
+    return [SomeData(value=idx % 100, source='bench') for idx in range(events_per_chain)]
+
+
+def run_threads(number_of_chains, events_per_chain, scheduler=None):
+    CountingSink.received = 0
+    CountingSink.expected = number_of_chains * events_per_chain
+    CountingSink.done = threading.Event()
+
+    start_time = time.perf_counter()
+    sources, modules = [], []
+    for idx in range(number_of_chains):
+        source = Source(name=f'src{idx}', scheduler=scheduler)
+        step1 = ExampleProcessor(name=f'step1-{idx}', scheduler=scheduler)
+        step2 = ExampleProcessor(name=f'step2-{idx}', scheduler=scheduler)
+        step3 = ExampleProcessor(name=f'step3-{idx}', scheduler=scheduler)
+        sink = CountingSink(name=f'sink{idx}', scheduler=scheduler)
+        step1.observe(source)
+        step2.observe(step1)
+        step3.observe(step2)
+        sink.observe(step3)
+        sources.append(source)
+        modules.extend([source, step1, step2, step3, sink])
+    if scheduler is not None:
+        scheduler.start()
+    for module in modules:
+        module.start()
+    startup_time = time.perf_counter() - start_time
+    number_of_threads = threading.active_count()
+
+    events = make_events(events_per_chain)
+    start_time = time.perf_counter()
+    for eventData in events:
+        for source in sources:
+            source.notify_observers(eventData)
+    CountingSink.done.wait()
+    elapsed_time = time.perf_counter() - start_time
+
+    for module in modules:
+        module.stop()
+    if scheduler is not None:
+        scheduler.stop()
+    return startup_time, number_of_threads, CountingSink.expected / elapsed_time
+
+
+async def run_asyncio(number_of_chains, events_per_chain):
+    AsyncCountingSink.received = 0
+    AsyncCountingSink.expected = number_of_chains * events_per_chain
+    AsyncCountingSink.done = asyncio.Event()
+
+    start_time = time.perf_counter()
+    sources, modules = [], []
+    for idx in range(number_of_chains):
+        source = AsyncSource(name=f'src{idx}')
+        step1 = AsyncExampleProcessor(name=f'step1-{idx}')
+        step2 = AsyncExampleProcessor(name=f'step2-{idx}')
+        step3 = AsyncExampleProcessor(name=f'step3-{idx}')
+        sink = AsyncCountingSink(name=f'sink{idx}')
+        step1.observe(source)
+        step2.observe(step1)
+        step3.observe(step2)
+        sink.observe(step3)
+        sources.append(source)
+        modules.extend([source, step1, step2, step3, sink])
+    for module in modules:
+        module.start()
+    startup_time = time.perf_counter() - start_time
+    number_of_threads = threading.active_count()
+
+    events = make_events(events_per_chain)
+    start_time = time.perf_counter()
+    for eventData in events:
+        for source in sources:
+            source.notify_observers(eventData)
+    await AsyncCountingSink.done.wait()
+    elapsed_time = time.perf_counter() - start_time
+
+    for module in modules:
+        await module.stop()
+    return startup_time, number_of_threads, AsyncCountingSink.expected / elapsed_time
+
+
+def report(backend, startup_time, number_of_threads, events_per_second):
+    print(f'{backend:10}: startup {startup_time * 1000:8.1f} ms, {number_of_threads:5} threads, {events_per_second:12,.0f} events/sec')
+
+
+if __name__ == '__main__':
+    number_of_chains = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    events_per_chain = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    print(f'{number_of_chains} chains of 5 nodes, {events_per_chain} events per chain')
+
+    report('threads', *run_threads(number_of_chains, events_per_chain))
+    report('scheduler', *run_threads(number_of_chains, events_per_chain, scheduler=Scheduler(workers=4)))
+    report('asyncio', *asyncio.run(run_asyncio(number_of_chains, events_per_chain)))
@@ -0,0 +1,85 @@
+# Benchmark: per-event delivery vs. batched delivery.
+# A producer pushes N events through an ExampleProcessor into a counting sink, and we measure events/sec end-to-end.
+#
+# Usage:
+#   python bench_batched.py [number_of_events] [batch_size]
+
+import sys
+import threading
+import time
+
+from lib import Observable, ExampleProcessor
+from lib.datatypes import SomeData
+
+
+class CountingSink(Observable):
+    """
+    counts the received events, and sets `done` once `expected` events arrived.
+    """
+
+    def __init__(self, name='counting-sink', expected=0, **kwargs):
+        super().__init__(name=name, **kwargs)
+        self.expected = expected
+        self.count = 0
+        self.done = threading.Event()
+
+    def internal_generate_events(self):
+        pass
+
+    def handle_events(self, sender, eventData):
+        if eventData is Ellipsis and sender is self:
+            return
+        self.count += 1
+        if self.count >= self.expected:
+            self.done.set()
+
+
+class Producer(Observable):
+    """
+    emits its events from the internal thread, either one by one, or in batches of `batch_size`.
+    """
+
+    def __init__(self, name='producer', events=(), batch_size=0, **kwargs):
+        super().__init__(name=name, **kwargs)
+        self.events = events
+        self.batch_size = batch_size
+
+    def internal_generate_events(self):
+        if self.batch_size:
+            for idx in range(0, len(self.events), self.batch_size):
+                self.notify_observers_many(self.events[idx:idx + self.batch_size])
+        else:
+            for eventData in self.events:
+                self.notify_observers(eventData)
+
+    def handle_events(self, sender, eventData):
+        pass
+
+
+def run(number_of_events, batched, batch_size):
+    events = [SomeData(value=idx % 1000, source='bench') for idx in range(number_of_events)]
+    producer = Producer(events=events, batch_size=batch_size if batched else 0)
+    processor = ExampleProcessor(name='step1', batched=batched)
+    sink = CountingSink(expected=number_of_events, batched=batched)
+    processor.observe(producer)
+    sink.observe(processor)
+
+    modules = [sink, processor, producer]
+    start_time = time.perf_counter()
+    for module in modules:
+        module.start()
+    sink.done.wait()
+    elapsed_time = time.perf_counter() - start_time
+    for module in modules:
+        module.stop()
+    return number_of_events / elapsed_time
+
+
+if __name__ == '__main__':
+    number_of_events = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    per_event = run(number_of_events, batched=False, batch_size=batch_size)
+    print(f'per-event: {per_event:12,.0f} events/sec')
+    batched = run(number_of_events, batched=True, batch_size=batch_size)
+    print(f'batched  : {batched:12,.0f} events/sec  (batch size {batch_size}, {batched / per_event:.1f}x)')
@@ -0,0 +1,45 @@
+# Benchmark: size and replay read speed of the binary event log, against the JSONL log of the same events.
+#
+# Usage:
+#   python bench_event_log.py [number_of_events] [batch_size]
+
+import os
+import sys
+import tempfile
+import time
+
+from lib import LoggerJsonl, LoggerBinary, JsonlRecordingSource, BinaryLogSource
+from bench_loggers import run
+
+
+def read_rate(label, data_source, number_of_events):
+    start_time = time.perf_counter()
+    count = 0
+    for item in data_source:
+        count += len(item) if label.endswith('batches') else 1
+    elapsed = time.perf_counter() - start_time
+    assert count == number_of_events, (label, count)
+    print(f'{label:40}: {number_of_events / elapsed:14,.0f} events/sec')
+
+
+if __name__ == '__main__':
+    number_of_events = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    print(f'{number_of_events:,} events, in batches of {batch_size}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        jsonl_filename = os.path.join(directory, 'bench.jsonl')
+        binary_filename = os.path.join(directory, 'bench.bin')
+        rate = run(LoggerJsonl(filename=jsonl_filename, print_on_close=False, batched=True, buffer_lines=10_000),
+                   number_of_events, batch_size)
+        print(f'{"write LoggerJsonl, batched, buffered":40}: {rate:14,.0f} events/sec')
+        rate = run(LoggerBinary(filename=binary_filename, batched=True), number_of_events, batch_size)
+        print(f'{"write LoggerBinary, batched":40}: {rate:14,.0f} events/sec')
+
+        jsonl_size, binary_size = os.path.getsize(jsonl_filename), os.path.getsize(binary_filename)
+        print(f'{"size LoggerJsonl":40}: {jsonl_size:14,} bytes')
+        print(f'{"size LoggerBinary":40}: {binary_size:14,} bytes, {jsonl_size / binary_size:.1f}x smaller')
+
+        read_rate('read JsonlRecordingSource', JsonlRecordingSource(jsonl_filename), number_of_events)
+        read_rate('read BinaryLogSource', BinaryLogSource(binary_filename), number_of_events)
+        read_rate('read BinaryLogSource, batches', BinaryLogSource(binary_filename).batches(), number_of_events)
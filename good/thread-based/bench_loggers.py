@@ -0,0 +1,61 @@
+# Benchmark: lines (documents, for yaml) per sec written by the loggers, fed with batches of SomeData through their event queue.
+#
+# Usage:
+#   python bench_loggers.py [number_of_events] [batch_size]
+
+import os
+import sys
+import tempfile
+import time
+
+from lib import Observable, LoggerJsonl, LoggerYaml
+from lib.datatypes import SomeData
+from lib.logger_yaml import FAST_DUMPER
+
+
+class Source(Observable):
+    generates_internal_events = False
+
+    def handle_events(self, sender, eventData):
+        pass
+
+
+def run(logger, number_of_events, batch_size):
+    source = Source(name='replay')
+    logger.observe(source)
+    events = [SomeData(value=idx, source='replay') for idx in range(number_of_events)]
+    logger.start()
+    start_time = time.perf_counter()
+    for idx in range(0, number_of_events, batch_size):
+        source.notify_observers_many(events[idx:idx + batch_size])
+    logger.stop()  # returns once the logger has written everything and closed the file.
+    return number_of_events / (time.perf_counter() - start_time)
+
+
+if __name__ == '__main__':
+    number_of_events = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    print(f'{number_of_events:,} events, in batches of {batch_size}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'bench.jsonl')
+        configurations = {
+            'LoggerJsonl, per event': dict(),
+            'LoggerJsonl, batched, buffered': dict(batched=True, buffer_lines=10_000),
+            'LoggerJsonl, batched, buffered, fsync': dict(batched=True, buffer_lines=10_000, fsync=True),
+        }
+        for label, options in configurations.items():
+            logger = LoggerJsonl(filename=filename, print_on_close=False, **options)
+            print(f'{label:40}: {run(logger, number_of_events, batch_size):12,.0f} lines/sec')
+
+        # the yaml emitter is much slower; fewer events keep the run short.
+        filename = os.path.join(directory, 'bench.yaml')
+        configurations = {
+            'LoggerYaml, per event': dict(),
+            'LoggerYaml, CDumper': dict(dumper=FAST_DUMPER),
+            'LoggerYaml, CDumper, 1000 docs per write': dict(dumper=FAST_DUMPER, documents_per_write=1000),
+            'LoggerYaml, fast, batched': dict(fast=True, batched=True),
+        }
+        for label, options in configurations.items():
+            logger = LoggerYaml(filename=filename, print_on_close=False, **options)
+            print(f'{label:40}: {run(logger, number_of_events // 10, batch_size):12,.0f} documents/sec')
@@ -0,0 +1,52 @@
+# Usage example: the demo_01.py graph, on the asyncio backend. All the modules run as tasks on a single event loop.
+import asyncio
+
+# import the modules
+from lib.aio import AsyncDataReplay, AsyncTimedEventSource, AsyncExampleProcessor, AsyncEventPrinter
+
+from lib.datatypes import SomeData
+
+
+async def main():
+    # create the instances of the modules
+    src_timer = AsyncTimedEventSource(interval=1, verbose=False)
+
+    src_data = AsyncDataReplay(data_source=[
+        SomeData(value=1, source='replay'),
+        SomeData(value=2, source='replay'),
+        SomeData(value=3, source='replay'),
+        SomeData(value=4, source='replay'),
+        SomeData(value=5, source='replay'),
+        SomeData(value=7, source='replay-last'),
+        ],
+        verbose=False)
+
+    data_processor1 = AsyncExampleProcessor(name='step1', verbose=False)
+    data_processor2 = AsyncExampleProcessor(name='step2', verbose=False)
+    data_processor3 = AsyncExampleProcessor(name='step3', verbose=False)
+
+    event_printer = AsyncEventPrinter()
+
+    modules = [src_timer, src_data, event_printer, data_processor1, data_processor2, data_processor3]
+
+    src_data.observe(src_timer)
+    data_processor1.observe(src_data)
+    data_processor2.observe(data_processor1)
+    data_processor3.observe(data_processor2)
+
+    event_printer.observe(src_timer)
+    event_printer.observe(data_processor3)
+
+    # start the system
+    for module in modules:
+        module.start()
+
+    # let the system run for a while
+    await asyncio.sleep(2)
+
+    # stop the tasks
+    for module in modules:
+        await module.stop()
+
+
+asyncio.run(main())
@@ -1,9 +1,14 @@
 from .observable import Observable
+from .scheduler import Scheduler
 from .data_replay import DataReplay
 from .timer import TimedEventSource
+from .timer_service import TimerService
 from .event_printer import EventPrinter
 from .logger_json import LoggerJsonl
 from .logger_yaml import LoggerYaml
+from .logger_binary import LoggerBinary
 from .processorBasic import ExampleProcessor
+from .processorPool import ProcessPoolProcessor
+from .recordings import BinaryRecordingWriter, BinaryRecordingSource, JsonlRecordingSource, JsonlSegmentsSource, BinaryLogSource
 
-from .datatypes import SomeData
+from .datatypes import SomeData, SlottedSomeData, FrozenSomeData, SomeDataBatch
@@ -0,0 +1,5 @@
+from .observable import AsyncObservable
+from .data_replay import AsyncDataReplay
+from .timer import AsyncTimedEventSource
+from .event_printer import AsyncEventPrinter
+from .processorBasic import AsyncExampleProcessor
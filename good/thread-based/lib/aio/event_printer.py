@@ -0,0 +1,14 @@
+from .observable import AsyncObservable
+
+
+class AsyncEventPrinter(AsyncObservable):
+    generates_internal_events = False
+
+    def __init__(self, name='event-printer'):
+        super().__init__(name=name)
+
+    async def handle_events(self, sender, eventData):
+        if eventData is Ellipsis and sender is self:
+            print("H|EventPrinter| received shutdown signal")
+            return
+        print(f"H|EventPrinter| from {sender.name}:{type(sender)} -> observed {eventData}")
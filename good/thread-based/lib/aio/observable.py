@@ -0,0 +1,72 @@
+import asyncio
+
+
+class AsyncObservable(object):
+    """
+    asyncio counterpart of `Observable`: same register/observe/notify surface,
+    but the incoming events wait in an `asyncio.Queue`, and the internal and incoming event loops are tasks, not threads.
+    All the nodes of a graph live on the one event loop, hence on one thread.
+
+    `start` must be called from within the running loop; `stop` and the handlers are coroutines.
+    """
+    # subclasses whose `internal_generate_events` does nothing should set this to False, so that no task is created for it.
+    generates_internal_events = True
+
+    def __init__(self, name='async-observable-base'):
+        self.name = name
+        self.observers = []
+        self.event_queue = asyncio.Queue()
+        # the identity of this entry tells the shutdown signal apart from any Ellipsis sent by other means.
+        self._shutdown_entry = (self, Ellipsis)
+        self.internal_event_task = None
+        self.incoming_event_task = None
+        self.please_shutdown = False
+
+    def start(self):
+        if self.generates_internal_events:
+            self.internal_event_task = asyncio.create_task(self.internal_generate_events(), name=f'{self.name}-internal')
+        self.incoming_event_task = asyncio.create_task(self.process_incoming_events(), name=f'{self.name}-incoming')
+
+    def register_observer(self, observer):
+        """
+        Registers an observer to receive notifications from this observable.
+        The observer must implement the "notify" method.
+        """
+        self.observers.append(observer)
+
+    def observe(self, observable):
+        """
+        calls the register_observer method of the observable object, passing self as the observer.
+        """
+        observable.register_observer(self)
+
+    def notify_observers(self, event):
+        for observer in self.observers:
+            observer.notify(self, event)
+
+    async def internal_generate_events(self):
+        raise NotImplementedError("Subclasses must implement internal_generate_events method")
+
+    async def process_incoming_events(self):
+        # runs until the shutdown signal itself is handled, so that the events queued before `stop` are not lost.
+        while True:
+            entry = await self.event_queue.get()  # suspends until an event is available.
+            await self.handle_events(*entry)
+            if entry is self._shutdown_entry:
+                return
+
+    async def handle_events(self, sender, event):
+        raise NotImplementedError("Subclasses must implement handle_events method")
+
+    def notify(self, sender, event):
+        """
+        Puts the event data into the event queue, to be processed by the `handle_events` coroutine.
+        Never suspends, so that the sender is not held up; must be called from the thread running the loop.
+        """
+        self.event_queue.put_nowait((sender, event))
+
+    async def stop(self):
+        self.please_shutdown = True
+        self.event_queue.put_nowait(self._shutdown_entry)  # wake up the incoming event task
+        tasks = [task for task in (self.internal_event_task, self.incoming_event_task) if task is not None]
+        await asyncio.gather(*tasks)
@@ -0,0 +1,30 @@
+from .observable import AsyncObservable
+from ..datatypes import SomeDataRecord
+
+
+class AsyncExampleProcessor(AsyncObservable):
+    """
+    asyncio port of `ExampleProcessor`: receives data events, processes them,
+    then notifies listeners with the processed data.
+    """
+    generates_internal_events = False
+
+    def __init__(self, name='unsetDataProcessor', verbose=False):
+        super().__init__(name=name)
+        self.verbose = verbose
+
+    async def handle_events(self, sender, eventData):
+        if eventData is Ellipsis and sender is self:
+            if self.verbose:
+                print(f"H|DataProcessor-{self.name}| received shutdown signal")
+            return
+
+        # do the actual processing here.
+        if isinstance(eventData, SomeDataRecord):
+            processedData = type(eventData)(value=eventData.value * eventData.value + 1, source=self.name)
+            if self.verbose:
+                print(
+                    f"H|DataProcessor-{self.name}| received event: {eventData} from {sender.name}, and processed it to {processedData}")
+            self.notify_observers(processedData)
+        else:
+            raise ValueError(f"H|DataProcessor-{self.name}| received an unexpected event: {eventData} of type {type(eventData)}")
@@ -0,0 +1,26 @@
+from .observable import AsyncObservable
+from ..datatypes import SomeData
+import asyncio
+
+
+class AsyncTimedEventSource(AsyncObservable):
+    def __init__(self, name='timer', interval=1.0, verbose=False):
+        super().__init__(name=name)
+        self.interval = interval
+        self.verbose = verbose
+
+    async def internal_generate_events(self):
+        while not self.please_shutdown:
+            await asyncio.sleep(self.interval)
+            eventData = SomeData(value=self.interval)
+            if self.verbose:
+                print(f'timerEventSource|internal| creating event {eventData} and notifying observers')
+            self.notify_observers(eventData)
+
+    async def handle_events(self, sender, eventData):
+        if eventData is not Ellipsis:
+            if self.verbose:
+                print(f"timerEventSource|handlder| received event: {eventData} from {sender.name}")
+        else:  # this is the last event before shutdown. Do any cleanup here.
+            if self.verbose:
+                print("timerEventSource|handler| received shutdown signal")
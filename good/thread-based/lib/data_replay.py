@@ -2,19 +2,132 @@ from .observable import Observable
 from .timer import TimedEventSource
 import time
 
+# how the replay is paced:
+REPLAY_ON_TICK = 'tick'  # one item per event received from a TimedEventSource.
+REPLAY_TIMED = 'timed'  # at the pace recorded in the `timestamp` of the items, sped up by `speed`.
+REPLAY_FAST = 'fast'  # as fast as the observers take the events; bound their queues to get backpressure.
+REPLAY_MODES = (REPLAY_ON_TICK, REPLAY_TIMED, REPLAY_FAST)
+
+
+def event_timestamp(eventData):
+    """the recorded timestamp of the item, or None for items without one - say the plain strings of a log."""
+    timestamp = getattr(eventData, 'timestamp', None)
+    return timestamp if type(timestamp) in (int, float) else None
+
 
 class DataReplay(Observable):
+    generates_internal_events = False
+
     def __init__(self,
                  name='data',
                  data_source=(1, 2, 3),
-                 verbose=False):
-        super().__init__(name=name)
+                 verbose=False,
+                 mode=REPLAY_ON_TICK,
+                 speed=1.0,
+                 batch_size=0,
+                 **kwargs):
+        """
+        :param mode: one of REPLAY_MODES. The timed and fast modes do not need a timer, they replay from the internal thread.
+        :param speed: REPLAY_TIMED only; 2.0 replays twice as fast as recorded.
+        :param batch_size: REPLAY_FAST only; when set, the items are sent with `notify_observers_many` in chunks of this size.
+        """
+        if mode not in REPLAY_MODES:
+            raise ValueError(f"mode must be one of {REPLAY_MODES}, got {mode}")
+        self.mode = mode
+        self.generates_internal_events = mode != REPLAY_ON_TICK
+        super().__init__(name=name, **kwargs)
         self.data_source = data_source
         self.data_gen = self.data_generator()
         self.verbose = verbose
+        self.speed = speed
+        self.batch_size = batch_size
+        # filled in by the timed and fast modes, as the replay goes.
+        self.replay_stats = {'events': 0, 'elapsed': 0.0, 'events_per_second': 0.0,
+                             'recorded_span': 0.0, 'lag_mean': None, 'lag_max': None, 'lag_last': None}
 
     def internal_generate_events(self):
-        pass
+        if self.mode == REPLAY_TIMED:
+            self.replay_timed()
+        elif self.mode == REPLAY_FAST:
+            self.replay_fast()
+        else:
+            return
+        if self.verbose:
+            print(f'DataEventSource|internal| finished generating events: {self.replay_stats}')
+        self.please_shutdown = True
+
+    def replay_timed(self):
+        """
+        Each item is due at (its timestamp - the first timestamp) / speed after the start; the deadlines are absolute,
+        so a late item does not delay the following ones. Lag is how late each item went out compared to its deadline.
+        An item without a timestamp is due along with the previous one, i.e. goes out right after it.
+        """
+        stats = self.replay_stats
+        start_time = time.monotonic()
+        first_timestamp = None
+        due_time = start_time
+        lag_total = 0.0
+        for eventData in self.data_gen:
+            timestamp = event_timestamp(eventData)
+            if timestamp is not None:
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                due_time = start_time + (timestamp - first_timestamp) / self.speed
+            while not self.please_shutdown:
+                remaining = due_time - time.monotonic()
+                if remaining <= 0:
+                    break
+                time.sleep(min(remaining, 0.1))  # in slices, so that stop() is not held up by long gaps.
+            if self.please_shutdown:
+                return
+            self.notify_observers(eventData)
+
+            now = time.monotonic()
+            lag = now - due_time
+            lag_total += lag
+            stats['events'] += 1
+            stats['elapsed'] = now - start_time
+            stats['events_per_second'] = stats['events'] / stats['elapsed'] if stats['elapsed'] > 0 else 0.0
+            if timestamp is not None:
+                stats['recorded_span'] = timestamp - first_timestamp
+            stats['lag_last'] = lag
+            stats['lag_mean'] = lag_total / stats['events']
+            stats['lag_max'] = lag if stats['lag_max'] is None else max(stats['lag_max'], lag)
+
+    def replay_fast(self):
+        """no schedule to keep; `recorded_span / elapsed` tells how much faster than recorded this went."""
+        stats = self.replay_stats
+        start_time = time.monotonic()
+        first_timestamp = None
+        chunk = []
+        for eventData in self.data_gen:
+            if self.please_shutdown:
+                return
+            if first_timestamp is None:
+                first_timestamp = event_timestamp(eventData)
+            if self.batch_size:
+                chunk.append(eventData)
+                if len(chunk) < self.batch_size:
+                    continue
+                self.notify_observers_many(chunk)
+                stats['events'] += len(chunk)
+                chunk = []
+            else:
+                self.notify_observers(eventData)
+                stats['events'] += 1
+            self._update_fast_stats(start_time, first_timestamp, eventData)
+        if chunk:
+            self.notify_observers_many(chunk)
+            stats['events'] += len(chunk)
+            self._update_fast_stats(start_time, first_timestamp, chunk[-1])
+
+    def _update_fast_stats(self, start_time, first_timestamp, eventData):
+        stats = self.replay_stats
+        stats['elapsed'] = time.monotonic() - start_time
+        stats['events_per_second'] = stats['events'] / stats['elapsed'] if stats['elapsed'] > 0 else 0.0
+        timestamp = event_timestamp(eventData)
+        if first_timestamp is not None and timestamp is not None:
+            stats['recorded_span'] = timestamp - first_timestamp
 
     def data_generator(self):
         yield from self.data_source
@@ -32,6 +145,8 @@ class DataReplay(Observable):
 
         # if the source of the event is a timer, emit a data event
         if isinstance(sender, TimedEventSource):
+            if self.mode != REPLAY_ON_TICK:
+                return  # paced by the internal thread instead.
             try:
                 eventData = self.data_gen.__next__()
                 if self.verbose:
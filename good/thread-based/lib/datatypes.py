@@ -1,4 +1,5 @@
 from attr import dataclass, field
+import numpy as np
 import time
 
 @dataclass
@@ -11,9 +12,88 @@ class Config:
         self.verbosity = 0
 
 
+class SomeDataRecord:
+    """
+    Common base of the `SomeData` record types; check events against this one.
+    Has empty slots, so that the slotted variants really have no `__dict__`.
+    """
+    __slots__ = ()
+
+
 @dataclass
-class SomeData:
+class SomeData(SomeDataRecord):
     timestamp: float = field(factory=time.time, repr=False, eq=False, order=False, hash=False)
     source: str = field(default="unset", repr=False, eq=False, order=False, hash=False)
     value: int = field(default=0)
 
+
+@dataclass(slots=True)
+class SlottedSomeData(SomeDataRecord):
+    """Same fields as `SomeData`, without a per-instance `__dict__`."""
+    timestamp: float = field(factory=time.time, repr=False, eq=False, order=False, hash=False)
+    source: str = field(default="unset", repr=False, eq=False, order=False, hash=False)
+    value: int = field(default=0)
+
+
+@dataclass(slots=True, frozen=True)
+class FrozenSomeData(SomeDataRecord):
+    """Slotted and immutable: one instance can be shared by any number of observers and threads, safely."""
+    timestamp: float = field(factory=time.time, repr=False, eq=False, order=False, hash=False)
+    source: str = field(default="unset", repr=False, eq=False, order=False, hash=False)
+    value: int = field(default=0)
+
+
+def value_column(values):
+    """the values as an int64 array - or a float64 one, as soon as any of them is a float."""
+    values = np.asarray(values)
+    return values.astype(np.float64 if values.dtype.kind == 'f' and len(values) else np.int64, copy=False)
+
+
+@dataclass(eq=False, repr=False)
+class SomeDataBatch:
+    """
+    Columnar batch of `SomeData`: one NumPy array per field, so that the processors can work on all the samples at once.
+    The sources are dictionary-encoded: `source_codes[i]` is the index of the source of sample i in `sources`.
+    The values are int64 or, for samples with float values, float64; keep the dtype through the processing.
+    A mix of ints and floats is all float64. Note that int64 values wrap around on overflow, unlike the Python ints of `SomeData`.
+    """
+    timestamps: np.ndarray = field(factory=lambda: np.empty(0, dtype=np.float64))
+    source_codes: np.ndarray = field(factory=lambda: np.empty(0, dtype=np.int32))
+    sources: tuple = field(default=())
+    values: np.ndarray = field(factory=lambda: np.empty(0, dtype=np.int64))
+
+    @classmethod
+    def from_values(cls, values, source="unset", timestamp=None):
+        """all the samples share one source, and one timestamp - taken once for the whole batch."""
+        values = value_column(values)
+        timestamp = time.time() if timestamp is None else timestamp
+        return cls(timestamps=np.full(len(values), timestamp, dtype=np.float64),
+                   source_codes=np.zeros(len(values), dtype=np.int32),
+                   sources=(source,),
+                   values=values)
+
+    @classmethod
+    def from_items(cls, items):
+        """packs a sequence of `SomeData`."""
+        codes = {}
+        source_codes = [codes.setdefault(item.source, len(codes)) for item in items]
+        return cls(timestamps=np.fromiter((item.timestamp for item in items), dtype=np.float64, count=len(items)),
+                   source_codes=np.array(source_codes, dtype=np.int32),
+                   sources=tuple(codes),
+                   values=value_column([item.value for item in items]))
+
+    def source_names(self):
+        """the decoded source of each sample."""
+        return np.asarray(self.sources, dtype=object)[self.source_codes]
+
+    def to_items(self, record_type=SomeData):
+        """unpacks back into a list of `SomeData`, or of any other of the record types."""
+        sources = self.sources
+        return [record_type(timestamp=timestamp, source=sources[code], value=value)
+                for timestamp, code, value in zip(self.timestamps.tolist(), self.source_codes.tolist(), self.values.tolist())]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return f"SomeDataBatch({len(self)} events, values={np.array2string(self.values, threshold=6)})"
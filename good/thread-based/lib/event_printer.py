@@ -1,9 +1,12 @@
 from .observable import Observable
+from .datatypes import SomeDataBatch
 
 
 class EventPrinter(Observable):
-    def __init__(self, name='event-printer'):
-        super().__init__(name=name)
+    generates_internal_events = False
+
+    def __init__(self, name='event-printer', **kwargs):
+        super().__init__(name=name, **kwargs)
 
     def internal_generate_events(self):
         pass
@@ -12,4 +15,7 @@ class EventPrinter(Observable):
         if eventData is Ellipsis and sender is self:
             print("H|EventPrinter| received shutdown signal")
             return
+        if isinstance(eventData, SomeDataBatch):
+            print(f"H|EventPrinter| from {sender.name}:{type(sender)} -> observed a batch of {len(eventData)} events from {', '.join(eventData.sources)}: {eventData}")
+            return
         print(f"H|EventPrinter| from {sender.name}:{type(sender)} -> observed {eventData}")
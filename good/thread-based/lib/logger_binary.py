@@ -0,0 +1,247 @@
+from .observable import Observable
+from .datatypes import SomeDataRecord, SomeDataBatch
+import numpy as np
+import pickle
+import struct
+import json
+import math
+
+# binary log layout, everything little-endian and 8-byte aligned:
+#   header:  magic, format version
+#   blocks:  block header, then the payload, zero-padded to a multiple of 8 bytes
+#   index:   an index block, listing all the blocks with their time range, and the name tables
+#   trailer: offset of the index block, magic; missing if the logger did not close the file.
+MAGIC = b'EVENTLG1'
+FILE_HEADER = struct.Struct('<8sI4x')  # magic, version
+BLOCK_HEADER = struct.Struct('<IIddQ')  # kind, count, first timestamp, last timestamp, payload size
+TRAILER = struct.Struct('<Q8s')  # index offset, magic
+VERSION = 2
+VERSIONS = (1, 2)  # readable versions; 1 has no BLOCK_JSON_EVENTS.
+
+# block kinds:
+BLOCK_NAMES = 0  # new entries of the source and sender name tables, as JSON; count is the JSON size.
+BLOCK_INT_RECORDS = 1  # SomeData columns: timestamps f8, values i8, source codes i4, sender codes i4.
+BLOCK_FLOAT_RECORDS = 2  # same, with f8 values.
+BLOCK_EVENTS = 3  # any other events, with `pickle_events`: each as (size, sender code) then its pickle.
+BLOCK_INDEX = 4  # the index, as JSON; count is the JSON size.
+BLOCK_MIXED_RECORDS = 5  # int and float values: f8 values, plus a fifth column of u1 flags, set for the ints.
+BLOCK_JSON_EVENTS = 6  # any other events, each as (size, sender code) then as JSON: see `json_event`.
+EVENT_BLOCKS = (BLOCK_EVENTS, BLOCK_JSON_EVENTS)
+RECORD_BLOCKS = (BLOCK_INT_RECORDS, BLOCK_FLOAT_RECORDS, BLOCK_MIXED_RECORDS)
+VALUE_DTYPES = {BLOCK_INT_RECORDS: np.int64, BLOCK_FLOAT_RECORDS: np.float64, BLOCK_MIXED_RECORDS: np.float64}
+EVENT_HEADER = struct.Struct('<Ii')  # pickle or JSON size, sender code
+RECORD_SIZE = 24  # bytes per SomeData record, over the four columns.
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+FLOAT_EXACT = 2 ** 53  # ints up to this size survive a round trip through a float.
+
+
+def padding(size):
+    return -size % 8
+
+
+def json_event(eventData):
+    """
+    the JSON of an event that does not fit the record blocks: an object of the fields of a `SomeData` - say with a value
+    beyond int64 - or, for anything else, the string of the event, as `LoggerJsonl` logs it.
+    """
+    if isinstance(eventData, SomeDataRecord):
+        try:
+            return json.dumps({'timestamp': eventData.timestamp, 'source': eventData.source, 'value': eventData.value})
+        except (TypeError, ValueError):
+            pass
+    return json.dumps(str(eventData))
+
+
+def record_columns(buffer, offset, count, kind):
+    """
+    the columns of a SomeData block, as arrays viewing `buffer` directly - nothing is copied:
+    timestamps, values, source codes, sender codes, and the int flags of a mixed block (None for the others).
+    """
+    timestamps = np.frombuffer(buffer, dtype=np.float64, count=count, offset=offset)
+    values = np.frombuffer(buffer, dtype=VALUE_DTYPES[kind], count=count, offset=offset + 8 * count)
+    source_codes = np.frombuffer(buffer, dtype=np.int32, count=count, offset=offset + 16 * count)
+    sender_codes = np.frombuffer(buffer, dtype=np.int32, count=count, offset=offset + 20 * count)
+    int_flags = None
+    if kind == BLOCK_MIXED_RECORDS:
+        int_flags = np.frombuffer(buffer, dtype=np.bool_, count=count, offset=offset + RECORD_SIZE * count)
+    return timestamps, values, source_codes, sender_codes, int_flags
+
+
+class LoggerBinary(Observable):
+    """
+    on event, appends it to a compact binary log, read back by `recordings.BinaryLogSource`.
+    on shutdown, writes out the last block and the index, and closes the file.
+
+    The `SomeData` events (and `SomeDataBatch`) are stored in columnar blocks of up to `block_size` records,
+    24 bytes per record - 25 when int and float values are mixed in one block.
+    Any other event goes into a block of its own kind, as JSON: the events other than `SomeData` as their string, the way
+    `LoggerJsonl` logs them. With `pickle_events`, those are pickled instead, so that they are replayed as they were;
+    reading them back then means unpickling, i.e. trusting the log. Block order is event order.
+    Each block header carries the time range of its records, and the index at the end of the file lists them all,
+    so that a reader can go straight to the blocks of a time window. Without the index - the logger did not get
+    to close the file - the reader walks the block headers instead, and loses at most the unwritten block.
+    """
+
+    generates_internal_events = False
+
+    def __init__(self, name='binary_logger', filename='eventLog.bin', block_size=4096, pickle_events=False, **kwargs):
+        """
+        :param block_size: number of records collected before writing them out as one block.
+        :param pickle_events: pickle the events other than `SomeData`, instead of logging their string.
+        """
+        super().__init__(name=name, **kwargs)
+        self.filename = filename
+        self.block_size = block_size
+        self.pickle_events = pickle_events
+        self.file = open(filename, 'wb')
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+        self.event_counter = 0
+        # name -> code, for the sources of the records and the senders of all events.
+        self.source_codes = {}
+        self.sender_codes = {}
+        self.names_written = (0, 0)  # number of source and sender names already in the file.
+        self.blocks = []  # [offset, kind, count, first timestamp, last timestamp], for the index.
+        # the block being collected: its kind, and its columns (or, for events, the packed entries).
+        self.pending_kind = None
+        self.pending = ([], [], [], [])
+        self.pending_exact = True  # all the int values pending would survive being stored as floats.
+
+    def internal_generate_events(self):
+        """no self-sourced events."""
+        pass
+
+    def handle_events(self, sender, eventData):
+        if eventData is Ellipsis and sender is self:
+            self.close()
+            return
+        self.log_event(sender, eventData)
+
+    def handle_events_batch(self, sender, events):
+        for eventData in events:
+            if eventData is Ellipsis and sender is self:
+                self.close()
+                return
+            self.log_event(sender, eventData)
+
+    def log_event(self, sender, eventData):
+        sender_code = self.code_of(self.sender_codes, sender.name)
+        if isinstance(eventData, SomeDataBatch):
+            self.log_batch(sender_code, eventData)
+            return
+        self.event_counter += 1
+        kind = BLOCK_JSON_EVENTS
+        exact = True
+        if isinstance(eventData, SomeDataRecord):
+            value = eventData.value
+            if type(value) is int and INT64_MIN <= value <= INT64_MAX:
+                kind = BLOCK_INT_RECORDS
+                exact = -FLOAT_EXACT <= value <= FLOAT_EXACT
+            elif type(value) is float:
+                kind = BLOCK_FLOAT_RECORDS
+        elif self.pickle_events:
+            kind = BLOCK_EVENTS
+        if kind != self.pending_kind:
+            if kind in RECORD_BLOCKS and self.pending_kind in RECORD_BLOCKS and self.pending_exact and exact:
+                kind = BLOCK_MIXED_RECORDS  # ints and floats interleaved, say a timer and a processor; keep one block.
+            else:
+                self.write_pending()
+            self.pending_kind = kind
+        self.pending_exact = self.pending_exact and exact
+        timestamps, values, source_codes, sender_codes = self.pending
+        if kind in EVENT_BLOCKS:
+            timestamp = getattr(eventData, 'timestamp', None)
+            timestamps.append(timestamp if type(timestamp) in (int, float) else math.nan)
+            if kind == BLOCK_EVENTS:
+                encoded = pickle.dumps(eventData, protocol=pickle.HIGHEST_PROTOCOL)
+            else:
+                encoded = json_event(eventData).encode('utf-8')
+            values.append(EVENT_HEADER.pack(len(encoded), sender_code) + encoded)
+        else:
+            timestamps.append(eventData.timestamp)
+            values.append(eventData.value)
+            source_codes.append(self.code_of(self.source_codes, eventData.source))
+            sender_codes.append(sender_code)
+        if len(timestamps) >= self.block_size:
+            self.write_pending()
+
+    def log_batch(self, sender_code, batch):
+        """a whole batch goes out as one block, straight from its columns."""
+        self.write_pending()
+        if not len(batch):
+            return
+        self.event_counter += len(batch)
+        recode = np.array([self.code_of(self.source_codes, source) for source in batch.sources], dtype=np.int32)
+        kind = BLOCK_FLOAT_RECORDS if batch.values.dtype.kind == 'f' else BLOCK_INT_RECORDS
+        self.write_records(kind,
+                           np.ascontiguousarray(batch.timestamps, dtype=np.float64),
+                           np.ascontiguousarray(batch.values, dtype=VALUE_DTYPES[kind]),
+                           recode[batch.source_codes] if len(recode) else np.zeros(len(batch), dtype=np.int32),
+                           np.full(len(batch), sender_code, dtype=np.int32))
+
+    @staticmethod
+    def code_of(codes, name):
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(codes)
+        return code
+
+    def write_pending(self):
+        kind, (timestamps, values, source_codes, sender_codes) = self.pending_kind, self.pending
+        if not timestamps:
+            return
+        if kind in EVENT_BLOCKS:
+            known = [timestamp for timestamp in timestamps if timestamp == timestamp]  # not NaN
+            time_range = (min(known), max(known)) if known else (math.nan, math.nan)
+            self.write_block(kind, len(values), time_range, b''.join(values))
+        else:
+            self.write_records(kind,
+                               np.array(timestamps, dtype=np.float64),
+                               np.array(values, dtype=VALUE_DTYPES[kind]),
+                               np.array(source_codes, dtype=np.int32),
+                               np.array(sender_codes, dtype=np.int32),
+                               np.array([type(value) is int for value in values], dtype=np.bool_)
+                               if kind == BLOCK_MIXED_RECORDS else None)
+        self.pending_kind = None
+        self.pending = ([], [], [], [])
+        self.pending_exact = True
+
+    def write_records(self, kind, timestamps, values, source_codes, sender_codes, int_flags=None):
+        columns = (timestamps, values, source_codes, sender_codes) + (() if int_flags is None else (int_flags,))
+        payload = b''.join(column.tobytes() for column in columns)
+        self.write_block(kind, len(timestamps), (float(timestamps.min()), float(timestamps.max())), payload)
+
+    def write_block(self, kind, count, time_range, payload):
+        self.write_new_names()
+        offset = self.file.tell()
+        self.file.write(BLOCK_HEADER.pack(kind, count, time_range[0], time_range[1], len(payload)) +
+                        payload + bytes(padding(len(payload))))
+        if kind != BLOCK_NAMES:
+            self.blocks.append([offset, kind, count] +
+                               [None if math.isnan(timestamp) else timestamp for timestamp in time_range])
+
+    def write_new_names(self):
+        """the names first used since the last block go out ahead of the block using them."""
+        sources_written, senders_written = self.names_written
+        if sources_written == len(self.source_codes) and senders_written == len(self.sender_codes):
+            return
+        names = json.dumps({'sources': list(self.source_codes)[sources_written:],
+                            'senders': list(self.sender_codes)[senders_written:]}).encode('utf-8')
+        self.names_written = (len(self.source_codes), len(self.sender_codes))
+        self.write_block(BLOCK_NAMES, len(names), (math.nan, math.nan), names)
+
+    def close(self):
+        print("H|LoggerBinary| received shutdown signal")
+        if self.file.closed:
+            return
+        self.write_pending()
+        self.write_new_names()
+        index = json.dumps({'blocks': self.blocks, 'sources': list(self.source_codes),
+                            'senders': list(self.sender_codes)}).encode('utf-8')
+        index_offset = self.file.tell()
+        self.file.write(BLOCK_HEADER.pack(BLOCK_INDEX, len(index), math.nan, math.nan, len(index)) +
+                        index + bytes(padding(len(index))))
+        self.file.write(TRAILER.pack(index_offset, MAGIC))
+        size = self.file.tell()
+        self.file.close()
+        print(f"H|LoggerBinary| {self.event_counter} events in {len(self.blocks)} blocks, {size} bytes, file closed")
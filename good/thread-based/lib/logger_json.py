@@ -1,29 +1,175 @@
 from .observable import Observable
-from .datatypes import SomeData
+from .datatypes import SomeDataRecord, SomeDataBatch
+from .segments import SegmentedFile
+import threading
 import json
+import time
+import os
+
+
+def json_number(number):
+    """same text as `json.dumps` gives for a number, without its overhead for the common cases."""
+    if type(number) is int:
+        return int.__repr__(number)
+    if type(number) is float and number - number == 0.0:  # finite
+        return float.__repr__(number)
+    return json.dumps(number)
+
+
+def timestamp_range(eventData):
+    """(first, last) timestamp of the samples of an event, or None if it has no timestamps."""
+    if isinstance(eventData, SomeDataRecord):
+        return eventData.timestamp, eventData.timestamp
+    if isinstance(eventData, SomeDataBatch) and len(eventData):
+        return float(eventData.timestamps.min()), float(eventData.timestamps.max())
+    return None
+
+
+def merge_ranges(time_range, other):
+    if time_range is None:
+        return other
+    if other is None:
+        return time_range
+    return min(time_range[0], other[0]), max(time_range[1], other[1])
 
 
 class LoggerJsonl(Observable):
-    def __init__(self, name='json_logger', filename='eventLog.jsonl'):
-        super().__init__(name=name)
+    """
+    on event, writes one JSON line with the sender name and the event data.
+    on shutdown, closes the file and, unless `print_on_close` is off, prints the result.
+
+    For high throughput, give a `buffer_lines`: lines are then collected in memory, and written in one go,
+    when that many are pending or, with `flush_interval`, at the latest that many seconds after the previous write.
+    With `fsync`, every write is also committed to disk - once for the whole group of lines.
+
+    Set `segment_bytes` and/or `segment_seconds` to write a `SegmentedFile` instead of one ever-growing file,
+    optionally compressing the closed segments; see `JsonlSegmentsSource` for replaying a time window out of them.
+    """
+    generates_internal_events = False
+
+    def __init__(self, name='json_logger', filename='eventLog.jsonl',
+                 buffer_lines=0, flush_interval=None, fsync=False, print_on_close=True,
+                 segment_bytes=None, segment_seconds=None, compression=None, **kwargs):
+        """
+        :param buffer_lines: number of lines collected before writing them; 0 writes every line right away.
+        :param flush_interval: if set, a background thread writes out the pending lines every `flush_interval` seconds.
+            Without `buffer_lines`, nothing is ever pending, and there is no such thread.
+        :param fsync: commit every write to disk with `os.fsync`.
+        :param print_on_close: read the file back and print it on shutdown. Slow for large logs.
+        :param segment_bytes: start a new segment once the current one holds that many bytes.
+        :param segment_seconds: start a new segment once the current one is that old.
+        :param compression: codec of the closed segments, one of `segments.CODECS`; segmented logs only.
+        """
+        self.generates_internal_events = flush_interval is not None and buffer_lines > 0
+        super().__init__(name=name, **kwargs)
         self.filename = filename
-        self.file = open(filename, 'w')
+        self.segmented = segment_bytes is not None or segment_seconds is not None
+        if self.segmented:
+            self.file = SegmentedFile(filename, max_bytes=segment_bytes, max_seconds=segment_seconds, compression=compression)
+        else:
+            self.file = open(filename, 'w')
+        self.buffer_lines = buffer_lines
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.print_on_close = print_on_close
+        self.buffer = []
+        self.buffer_time_range = None  # of the events in the buffer, for the manifest of the segments.
+        self.buffer_lock = threading.Lock()
+        # the start of each line, per sender; and the JSON-encoded source names.
+        self._line_prefixes = {}
+        self._encoded_sources = {}
 
     def internal_generate_events(self):
-        """no self-sourced events."""
-        pass
+        """no self-sourced events; only the periodic flushing, when enabled."""
+        while not self.please_shutdown:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """writes out the pending lines."""
+        with self.buffer_lock:
+            if self.file.closed:
+                return
+            if self.buffer:
+                self.write_text(''.join(self.buffer), self.buffer_time_range)
+                self.buffer = []
+                self.buffer_time_range = None
+            if self.fsync:
+                self.file.flush()
+                os.fsync(self.file.fileno())
 
     def handle_events(self, sender, eventData):
         if eventData is Ellipsis and sender is self:
-            print("H|jsonlLogger| received shutdown signal")
+            self.close()
+            return
+        self.write_lines(self.serialize(sender, eventData), timestamp_range(eventData))
+
+    def handle_events_batch(self, sender, events):
+        lines = []
+        time_range = None
+        for eventData in events:
+            if eventData is Ellipsis and sender is self:
+                self.write_lines(lines, time_range)
+                self.close()
+                return
+            lines.extend(self.serialize(sender, eventData))
+            time_range = merge_ranges(time_range, timestamp_range(eventData))
+        self.write_lines(lines, time_range)
+
+    def write_lines(self, lines, time_range=None):
+        if not self.buffer_lines:
+            # the lock still keeps the flushing thread, and close, off the file meanwhile.
+            with self.buffer_lock:
+                self.write_text(''.join(lines), time_range)
+                if self.fsync:
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+            return
+        with self.buffer_lock:
+            self.buffer.extend(lines)
+            self.buffer_time_range = merge_ranges(self.buffer_time_range, time_range)
+            if len(self.buffer) < self.buffer_lines:
+                return
+        self.flush()
+
+    def write_text(self, text, time_range):
+        if self.segmented:
+            self.file.roll_if_due()  # only ever between whole lines.
+            if time_range is not None:
+                self.file.note_timestamps(*time_range)
+        self.file.write(text)
+
+    def close(self):
+        print("H|jsonlLogger| received shutdown signal")
+        self.flush()
+        with self.buffer_lock:
             self.file.close()
-            with open(self.filename, 'r') as f:
-                print(f.read())
-            print(f"H|jsonlLogger| file closed and contents printed")
+        if self.segmented:
+            print(f"H|jsonlLogger| segments closed, listed in {self.file.manifest_filename}")
             return
-        if isinstance(eventData, SomeData):
-            from attr import asdict
-            eventPacket = {'sender': sender.name, 'event': asdict(eventData)}
-        else:
-            eventPacket = {'sender': sender.name, 'event': str(eventData)}
-        self.file.write(json.dumps(eventPacket) + '\n')
\ No newline at end of file
+        if not self.print_on_close:
+            print(f"H|jsonlLogger| file closed")
+            return
+        with open(self.filename, 'r') as f:
+            print(f.read())
+        print(f"H|jsonlLogger| file closed and contents printed")
+
+    def serialize(self, sender, eventData):
+        """the lines for one event; a batch gives one line per sample, same as if the samples came one by one."""
+        if isinstance(eventData, SomeDataRecord):
+            return [self.serialize_some_data(sender.name, eventData.timestamp, eventData.source, eventData.value)]
+        if isinstance(eventData, SomeDataBatch):
+            serialize_some_data = self.serialize_some_data
+            return [serialize_some_data(sender.name, timestamp, source, value)
+                    for timestamp, source, value in zip(eventData.timestamps.tolist(), eventData.source_names().tolist(), eventData.values.tolist())]
+        return [json.dumps({'sender': sender.name, 'event': str(eventData)}) + '\n']
+
+    def serialize_some_data(self, sender_name, timestamp, source, value):
+        """builds the same line as `json.dumps` of the `attr.asdict` of the record, but without going through a dict."""
+        prefix = self._line_prefixes.get(sender_name)
+        if prefix is None:
+            prefix = self._line_prefixes[sender_name] = '{"sender": ' + json.dumps(sender_name) + ', "event": {"timestamp": '
+        encoded_source = self._encoded_sources.get(source)
+        if encoded_source is None:
+            encoded_source = self._encoded_sources[source] = json.dumps(source)
+        return prefix + json_number(timestamp) + ', "source": ' + encoded_source + ', "value": ' + json_number(value) + '}}\n'
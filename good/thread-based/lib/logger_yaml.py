@@ -1,19 +1,60 @@
 from .observable import Observable
+from .logger_json import timestamp_range, merge_ranges
+from .segments import SegmentedFile
 import yaml
 
+# the libyaml C emitter when PyYAML was built with it, else the pure-Python one. Same output, many times faster.
+FAST_DUMPER = getattr(yaml, 'CDumper', yaml.Dumper)
+
 
 class LoggerYaml(Observable):
     """
     on event, attempts to convert the event data to yaml, and stores to a file.
     on shutdown, closes the file and also prints the result.
+
+    Set `segment_bytes` and/or `segment_seconds` to write a `SegmentedFile` instead of one ever-growing file;
+    a new segment is only ever started between two documents.
+
+    For high throughput, use `fast=True`, or tune the individual knobs: `dumper=FAST_DUMPER`,
+    `documents_per_write` to emit several documents with one `yaml.dump_all` and one write,
+    and `counter_every` to notify the event counter only every so many events.
+    The file holds the same documents either way.
     """
 
-    def __init__(self, name='yaml_logger', filename='eventLog.yaml', verbose=False):
-        super().__init__(name=name)
+    generates_internal_events = False
+
+    def __init__(self, name='yaml_logger', filename='eventLog.yaml', verbose=False,
+                 segment_bytes=None, segment_seconds=None, compression=None,
+                 fast=False, dumper=None, documents_per_write=None, counter_every=None, print_on_close=True, **kwargs):
+        """
+        :param segment_bytes: start a new segment once the current one holds that many bytes.
+        :param segment_seconds: start a new segment once the current one is that old.
+        :param compression: codec of the closed segments, one of `segments.CODECS`; segmented logs only.
+        :param fast: defaults for the following three for throughput: FAST_DUMPER, 1000 documents per write, counter every 1000 events.
+        :param dumper: the yaml Dumper class; yaml.Dumper by default.
+        :param documents_per_write: number of documents collected before writing them; 1 writes every document right away.
+            The pending documents are always written on shutdown.
+        :param counter_every: notify `{'event_counter': n}` only when n is a multiple of this; 1 notifies on every event.
+        :param print_on_close: read the file back and print it on shutdown. Slow for large logs.
+        """
+        super().__init__(name=name, **kwargs)
         self.event_counter = 0
         self.verbose = verbose
         self.filename = filename
-        self.file = open(filename, 'w')
+        self.dumper = dumper if dumper is not None else (FAST_DUMPER if fast else yaml.Dumper)
+        self.documents_per_write = documents_per_write if documents_per_write is not None else (1000 if fast else 1)
+        self.counter_every = counter_every if counter_every is not None else (1000 if fast else 1)
+        if self.documents_per_write < 1 or self.counter_every < 1:
+            raise ValueError(f"documents_per_write and counter_every must be at least 1, "
+                             f"got {self.documents_per_write} and {self.counter_every}")
+        self.print_on_close = print_on_close
+        self.pending_documents = []
+        self.pending_time_range = None  # of the pending documents, for the manifest of the segments.
+        self.segmented = segment_bytes is not None or segment_seconds is not None
+        if self.segmented:
+            self.file = SegmentedFile(filename, max_bytes=segment_bytes, max_seconds=segment_seconds, compression=compression)
+        else:
+            self.file = open(filename, 'w')
         self.file.write('---\n')
 
     def internal_generate_events(self):
@@ -23,17 +64,55 @@ class LoggerYaml(Observable):
     def handle_events(self, sender, eventData):
         # shutdown cleanup mode:
         if eventData is Ellipsis and sender is self:
-            print("H|LoggerYaml| received shutdown signal")
-            self.file.close()
-            with open(self.filename, 'r') as f:
-                print(f.read())
-            print(f"H|LoggerYaml| file closed and contents printed")
+            self.close()
             return
 
         # normal operation.
+        self.log_event(sender, eventData)
+        if self.event_counter % self.counter_every == 0:
+            self.notify_observers({'event_counter': self.event_counter})
+
+    def handle_events_batch(self, sender, events):
+        counter_before = self.event_counter
+        for eventData in events:
+            if eventData is Ellipsis and sender is self:
+                self.close()
+                return
+            self.log_event(sender, eventData)
+        # one notification per batch at most, with the latest count, if the batch crossed a multiple of counter_every.
+        if self.event_counter // self.counter_every > counter_before // self.counter_every:
+            self.notify_observers({'event_counter': self.event_counter})
+
+    def log_event(self, sender, eventData):
         self.event_counter += 1
-        eventPacket = {'sender': sender.name, 'event': eventData}
-        yaml.dump(eventPacket, self.file)
-        # add a separator
-        self.file.write('---\n')
-        self.notify_observers({'event_counter': self.event_counter})
+        self.pending_documents.append({'sender': sender.name, 'event': eventData})
+        self.pending_time_range = merge_ranges(self.pending_time_range, timestamp_range(eventData))
+        if len(self.pending_documents) >= self.documents_per_write:
+            self.write_pending()
+
+    def write_pending(self):
+        """writes out the pending documents, each followed by a separator, the same as dumping them one by one."""
+        if not self.pending_documents:
+            return
+        if self.segmented:
+            self.file.roll_if_due()  # only ever between whole documents.
+            if self.pending_time_range is not None:
+                self.file.note_timestamps(*self.pending_time_range)
+        # dump_all puts the separators between the documents; the one after the last is added here.
+        self.file.write(yaml.dump_all(self.pending_documents, Dumper=self.dumper) + '---\n')
+        self.pending_documents = []
+        self.pending_time_range = None
+
+    def close(self):
+        print("H|LoggerYaml| received shutdown signal")
+        self.write_pending()
+        self.file.close()
+        if self.segmented:
+            print(f"H|LoggerYaml| segments closed, listed in {self.file.manifest_filename}")
+            return
+        if not self.print_on_close:
+            print(f"H|LoggerYaml| file closed")
+            return
+        with open(self.filename, 'r') as f:
+            print(f.read())
+        print(f"H|LoggerYaml| file closed and contents printed")
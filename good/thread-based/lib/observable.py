@@ -1,54 +1,302 @@
 import threading
 import time
-from queue import Queue
+import traceback
+import weakref
+from queue import Queue, Empty, Full
 from abc import ABC, abstractmethod
 import yaml
 import json
 from .datatypes import Config
 
+# what to do with an incoming event when the event queue is full:
+OVERFLOW_BLOCK = 'block'  # block the sender until there is room.
+OVERFLOW_DROP_NEWEST = 'drop_newest'  # discard the incoming event.
+OVERFLOW_DROP_OLDEST = 'drop_oldest'  # discard the oldest pending event to make room.
+OVERFLOW_COALESCE = 'coalesce'  # replace the newest pending event with the same key; block if there is none.
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE)
+
+
+def coalesce_by_sender(sender, event):
+    """default coalescing key: only the most recent pending event of each sender is kept."""
+    return sender
+
+
+class NotifyAdapter(object):
+    """stands in for an observer that only implements "notify", in `Observable.observers`."""
+    __slots__ = ('observer',)
+
+    def __init__(self, observer):
+        self.observer = observer
+
+    def notify(self, sender, event):
+        self.observer.notify(sender, event)
+
+    def notify_entry(self, entry):
+        self.observer.notify(entry[0], entry[1])
+
+    def notify_many(self, sender, events):
+        notify = self.observer.notify
+        for event in events:
+            notify(sender, event)
+
+
+class WeakObserver(object):
+    """stands in for an observer in `Observable.observers`, without keeping it alive; once it is collected, does nothing."""
+    __slots__ = ('ref', 'adapted')
+
+    def __init__(self, observer, on_dead):
+        self.ref = weakref.ref(observer, on_dead)
+        # an observer with "notify" only gets everything through it, see `NotifyAdapter`.
+        self.adapted = not (hasattr(observer, 'notify_entry') and hasattr(observer, 'notify_many'))
+
+    def notify(self, sender, event):
+        observer = self.ref()
+        if observer is not None:
+            observer.notify(sender, event)
+
+    def notify_entry(self, entry):
+        observer = self.ref()
+        if observer is not None:
+            if self.adapted:
+                observer.notify(entry[0], entry[1])
+            else:
+                observer.notify_entry(entry)
+
+    def notify_many(self, sender, events):
+        observer = self.ref()
+        if observer is not None:
+            if self.adapted:
+                for event in events:
+                    observer.notify(sender, event)
+            else:
+                observer.notify_many(sender, events)
+
 
 class Observable(object):
-    def __init__(self, name='observable-base'):
+    # subclasses whose `internal_generate_events` does nothing should set this to False, so that no internal thread is spawned;
+    # then, in scheduler mode, they do not spawn any thread at all.
+    generates_internal_events = True
+
+    def __init__(self, name='observable-base', batched=False,
+                 max_queue_size=0, overflow_policy=OVERFLOW_BLOCK, coalesce_key=coalesce_by_sender,
+                 scheduler=None):
+        """
+        :param name: name of this node, used by the observers to tell the senders apart.
+        :param batched: opt-in batched delivery. When set, the incoming event thread drains everything that is pending
+            in the queue in one go, and hands it over to `handle_events_batch` instead of calling `handle_events` per event.
+        :param max_queue_size: bound on the number of pending queue entries; 0 means unbounded.
+            Note that in batched mode, a batch sent with `notify_many` is a single entry.
+        :param overflow_policy: one of OVERFLOW_POLICIES, applied when the queue is full.
+        :param coalesce_key: callable (sender, event) -> key, used by the OVERFLOW_COALESCE policy.
+        :param scheduler: optional shared `Scheduler`. When given, there is no incoming_event_thread;
+            instead, the event queue is a mailbox, drained by the scheduler's worker threads.
+            Avoid the OVERFLOW_BLOCK policy there, as a blocked sender holds on to one of the shared workers.
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy must be one of {OVERFLOW_POLICIES}, got {overflow_policy}")
         self.name = name
+        # replaced as a whole on change, never modified in place, so that notifying needs no lock.
         self.observers = []
-        self.event_queue = Queue()
-        self.internal_event_thread = threading.Thread(target=self.internal_generate_events)
-        self.incoming_event_thread = threading.Thread(target=self.process_incoming_events)
+        self._observers_lock = threading.Lock()
+        self._prune_observers = False  # set when a weakly registered observer got collected.
+        self.observers_pruned = 0
+        self.batched = batched
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+        self.coalesce_key = coalesce_key
+        # counters of the events affected by the overflow policies. Only touched on the overflow path.
+        self.queue_stats = {'blocked': 0, 'dropped_newest': 0, 'dropped_oldest': 0, 'coalesced': 0}
+        self._queue_stats_lock = threading.Lock()
+        self.event_queue = Queue(maxsize=max_queue_size)
+        # the identity of this entry tells the shutdown signal apart from any Ellipsis sent by other means.
+        self._shutdown_entry = (self, (Ellipsis,) if batched else Ellipsis)
+        self.scheduler = scheduler
+        self.internal_event_thread = None
+        if self.generates_internal_events:
+            self.internal_event_thread = threading.Thread(target=self.internal_generate_events)
+        if scheduler is None:
+            if batched:
+                self.incoming_event_thread = threading.Thread(target=self.process_incoming_event_batches)
+            else:
+                self.incoming_event_thread = threading.Thread(target=self.process_incoming_events)
+        else:
+            self.incoming_event_thread = None
+            # a mailbox is either idle, or sitting in the scheduler's ready queue, or being drained by one worker.
+            self._mailbox_lock = threading.Lock()
+            self._mailbox_scheduled = False
+            self._mailbox_closed = threading.Event()
         self.please_shutdown = False
 
     def start(self):
-        self.internal_event_thread.start()
-        self.incoming_event_thread.start()
+        if self.internal_event_thread is not None:
+            self.internal_event_thread.start()
+        if self.incoming_event_thread is not None:
+            self.incoming_event_thread.start()
 
-    def register_observer(self, observer):
+    def register_observer(self, observer, weak=False):
         """
         Registers an observer to receive notifications from this observable.
         The observer must implement the "notify" method.
         It must be exactly the method named "notify".
+        `notify_observers` and `notify_observers_many` go through "notify_entry" and "notify_many" instead,
+        which every `Observable` implements; an observer lacking those gets everything through "notify", one event at a time.
+
+        :param weak: hold the observer through a weak reference only, so that this observable does not keep it alive.
+            The collected observers are pruned on the next notification. Note that a started observer is referred to
+            by its own threads, and so is only ever collected once stopped.
         """
-        self.observers.append(observer)
+        if weak:
+            observer = WeakObserver(observer, self._observer_died)
+        elif not (hasattr(observer, 'notify_entry') and hasattr(observer, 'notify_many')):
+            observer = NotifyAdapter(observer)
+        with self._observers_lock:
+            self.observers = self.observers + [observer]
 
-    def observe(self, observable):
+    def observe(self, observable, weak=False):
         """
         calls the register_observer method of the observable object, passing self as the observer.
         """
-        observable.register_observer(self)
+        observable.register_observer(self, weak=weak)
+
+    def _observer_died(self, reference):
+        # may run on any thread, at any time, even with the lock held: only sets the flag.
+        self._prune_observers = True
+
+    def prune_observers(self):
+        """removes the weakly registered observers that got collected; returns how many there were."""
+        with self._observers_lock:
+            self._prune_observers = False
+            live = [observer for observer in self.observers
+                    if not (isinstance(observer, WeakObserver) and observer.ref() is None)]
+            pruned = len(self.observers) - len(live)
+            self.observers = live
+            self.observers_pruned += pruned
+        return pruned
+
+    def observer_counts(self):
+        """number of live observers, of dead weak ones not pruned yet, and of those pruned so far."""
+        observers = self.observers
+        dead = sum(1 for observer in observers if isinstance(observer, WeakObserver) and observer.ref() is None)
+        return {'live': len(observers) - dead, 'dead': dead, 'pruned': self.observers_pruned}
 
     def notify_observers(self, event):
+        if self._prune_observers:
+            self.prune_observers()
+        entry = (self, event)  # one queue entry, shared by all the observers.
+        for observer in self.observers:
+            observer.notify_entry(entry)
+
+    def notify_observers_many(self, events):
+        """
+        Sends a whole sequence of events to every observer.
+        The sequence is frozen into a single tuple, which is then shared by all the observers - do not mutate the events.
+        """
+        if self._prune_observers:
+            self.prune_observers()
+        events = tuple(events)
+        if not events:
+            return
         for observer in self.observers:
-            observer.notify(self, event)
+            observer.notify_many(self, events)
 
     def internal_generate_events(self):
         raise NotImplementedError("Subclasses must implement internal_generate_events method")
 
     def process_incoming_events(self):
-        while not self.please_shutdown:
-            sender, event = self.event_queue.get()  # blocks until an event is available. This is thread-safe because the queue is thread-safe.
-            self.handle_events(sender, event)
+        # runs until the shutdown signal itself is handled, so that the events queued before `stop` are not lost,
+        # same as in scheduler mode.
+        while True:
+            entry = self.event_queue.get()  # blocks until an event is available. This is thread-safe because the queue is thread-safe.
+            self.handle_events(*entry)
+            if entry is self._shutdown_entry:
+                return
+
+    def process_incoming_event_batches(self):
+        """
+        Batched counterpart of `process_incoming_events`.
+        Blocks until at least one entry is available, then drains the queue without blocking,
+        and hands over the runs of consecutive events from the same sender to `handle_events_batch`.
+        This way, the lock and condition-variable wakeup is paid once per burst, not once per event.
+        """
+        while True:
+            pending = [self.event_queue.get()]  # blocks until an event is available.
+            while pending[-1] is not self._shutdown_entry:
+                try:
+                    pending.append(self.event_queue.get_nowait())
+                except Empty:
+                    break
+            self._dispatch_batches(pending)
+            if pending[-1] is self._shutdown_entry:
+                return
+
+    def _dispatch_batches(self, pending):
+        # group the consecutive entries by sender, so that the ordering of the events is preserved.
+        sender, events = pending[0][0], list(pending[0][1])
+        for next_sender, next_events in pending[1:]:
+            if next_sender is sender:
+                events.extend(next_events)
+            else:
+                self.handle_events_batch(sender, events)
+                sender, events = next_sender, list(next_events)
+        self.handle_events_batch(sender, events)
+
+    def run_mailbox(self, limit):
+        """
+        Scheduler mode counterpart of `process_incoming_events`, called by a worker of the `Scheduler`.
+        Handles at most `limit` pending entries, then either goes idle, or asks to be scheduled again if there is more.
+        The scheduler never runs the same mailbox on two workers at once, so the handlers see the events in order.
+        """
+        pending = []
+        while len(pending) < limit:
+            try:
+                entry = self.event_queue.get_nowait()
+            except Empty:
+                break
+            pending.append(entry)
+            if entry is self._shutdown_entry:
+                break  # whatever comes after the shutdown signal is never handled.
+        closed = bool(pending) and pending[-1] is self._shutdown_entry
+        try:
+            if not pending:
+                pass
+            elif self.batched:
+                self._dispatch_batches(pending)
+            else:
+                for sender, event in pending:
+                    self.handle_events(sender, event)
+        except Exception:
+            # same outcome as an exception ending the incoming_event_thread: this observable stops handling events.
+            traceback.print_exc()
+            closed = True
+
+        with self._mailbox_lock:
+            if closed:
+                self._mailbox_closed.set()
+                return
+            if self.event_queue.empty():
+                self._mailbox_scheduled = False
+                return
+        # more work arrived meanwhile; go to the back of the ready queue so that the other mailboxes get their turn.
+        self.scheduler.schedule(self)
+
+    def _schedule_mailbox(self):
+        with self._mailbox_lock:
+            if self._mailbox_scheduled or self._mailbox_closed.is_set():
+                return
+            self._mailbox_scheduled = True
+        self.scheduler.schedule(self)
 
     def handle_events(self, sender, event):
         raise NotImplementedError("Subclasses must implement handle_events method")
 
+    def handle_events_batch(self, sender, events):
+        """
+        Called in batched mode with the list of events received from one sender, in order.
+        By default, simply calls `handle_events` for each of them. Override this to process the batch in one go.
+        """
+        for event in events:
+            self.handle_events(sender, event)
+
     def notify(self, sender, event):
         """
         Puts the event data into the event queue, to be processed by the `handle_events` method, animated by the internal "incoming_event_thread".
@@ -58,11 +306,122 @@ class Observable(object):
 
         Hence, actual signal processing is done in the `handle_events` method animated by own thread.
         """
-        self.event_queue.put((sender, event))
+        if self.batched:
+            self._enqueue((sender, (event,)))
+        else:
+            self._enqueue((sender, event))
+        if self.scheduler is not None:
+            self._schedule_mailbox()
+
+    def notify_entry(self, entry):
+        """
+        Same as `notify`, for a ready-made (sender, event) tuple.
+        As the queue entries are never mutated, the same tuple can go into the queues of all the observers.
+        """
+        if self.batched:
+            self._enqueue((entry[0], (entry[1],)))
+        else:
+            self._enqueue(entry)
+        if self.scheduler is not None:
+            self._schedule_mailbox()
+
+    def notify_many(self, sender, events):
+        """
+        Same as `notify`, but for a sequence of events.
+        In batched mode, the whole sequence costs a single queue round trip.
+        """
+        if self.batched:
+            self._enqueue((sender, events))
+        else:
+            for event in events:
+                self._enqueue((sender, event))
+        if self.scheduler is not None:
+            self._schedule_mailbox()
+
+    def _enqueue(self, entry):
+        if not self.max_queue_size:
+            self.event_queue.put(entry)
+            return
+        try:
+            self.event_queue.put_nowait(entry)
+        except Full:
+            self._handle_overflow(entry)
+
+    def _entry_size(self, event):
+        """number of events carried by one queue entry."""
+        return len(event) if self.batched else 1
+
+    def _count(self, counter, amount):
+        with self._queue_stats_lock:
+            self.queue_stats[counter] += amount
+
+    def _handle_overflow(self, entry):
+        sender, event = entry
+        if self.overflow_policy == OVERFLOW_DROP_NEWEST:
+            self._count('dropped_newest', self._entry_size(event))
+            return
+
+        if self.overflow_policy == OVERFLOW_DROP_OLDEST:
+            pending = self.event_queue.queue
+            while True:
+                full, dropped_entry = False, None
+                with self.event_queue.mutex:
+                    if len(pending) >= self.max_queue_size:
+                        full = True
+                        # oldest first; never drop the shutdown signal. The new entry takes the freed slot at once,
+                        # so the queue stays full, and nobody waiting on it needs waking up.
+                        for idx, pending_entry in enumerate(pending):
+                            if pending_entry is not self._shutdown_entry:
+                                del pending[idx]
+                                pending.append(entry)
+                                dropped_entry = pending_entry
+                                break
+                if dropped_entry is not None:
+                    self._count('dropped_oldest', self._entry_size(dropped_entry[1]))
+                    return
+                if full:
+                    # nothing but the shutdown signal pending; what comes after it is never handled anyway.
+                    self._count('dropped_newest', self._entry_size(event))
+                    return
+                try:
+                    self.event_queue.put_nowait(entry)  # the consumer made room meanwhile.
+                    return
+                except Full:
+                    continue  # another sender took the free slot.
+
+        if self.overflow_policy == OVERFLOW_COALESCE:
+            key = self.coalesce_key(sender, event)
+            pending = self.event_queue.queue
+            replaced = False
+            with self.event_queue.mutex:
+                # newest first; never coalesce away the shutdown signal.
+                for idx in range(len(pending) - 1, -1, -1):
+                    if pending[idx] is self._shutdown_entry:
+                        continue
+                    pending_sender, pending_event = pending[idx]
+                    if self.coalesce_key(pending_sender, pending_event) == key:
+                        pending[idx] = entry
+                        replaced = True
+                        break
+            if replaced:
+                self._count('coalesced', self._entry_size(pending_event))
+                return
+            # nothing to coalesce with; fall back to blocking.
+
+        self._count('blocked', self._entry_size(event))
+        self.event_queue.put(entry)
 
     def stop(self):
         self.please_shutdown = True
-        self.notify(self, Ellipsis)  # unblock the incoming_event_thread
-        self.internal_event_thread.join()
-        self.incoming_event_thread.join()
+        # unblock the incoming_event_thread. This bypasses the overflow policy, so that the signal is never dropped;
+        # if the queue is full, the consumer will make room as it is still running.
+        self.event_queue.put(self._shutdown_entry)
+        if self.scheduler is not None:
+            self._schedule_mailbox()
+        if self.internal_event_thread is not None:
+            self.internal_event_thread.join()
+        if self.incoming_event_thread is not None:
+            self.incoming_event_thread.join()
+        else:
+            self._mailbox_closed.wait()  # the scheduler must still be running for this to return.
 
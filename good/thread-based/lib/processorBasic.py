@@ -1,6 +1,6 @@
 from .observable import Observable
 from .datatypes import Config
-from .datatypes import SomeData
+from .datatypes import SomeDataRecord, SomeDataBatch
 
 
 class ExampleProcessor(Observable):
@@ -9,8 +9,10 @@ class ExampleProcessor(Observable):
     Then notifies listeners with the processed data.
     """
 
-    def __init__(self, name='unsetDataProcessor', verbose=False):
-        super().__init__(name=name)
+    generates_internal_events = False
+
+    def __init__(self, name='unsetDataProcessor', verbose=False, **kwargs):
+        super().__init__(name=name, **kwargs)
         self.verbose = verbose
 
     def internal_generate_events(self):
@@ -23,14 +25,42 @@ class ExampleProcessor(Observable):
             return
 
         # do the actual processing here.
-        if isinstance(eventData, SomeData):
-            newValue = SomeData(value=eventData.value * eventData.value + 1, source=self.name)
+        if isinstance(eventData, SomeDataRecord):
+            # the processed data is of the same record type as the received one.
+            newValue = type(eventData)(value=eventData.value * eventData.value + 1, source=self.name)
             processedData = newValue
             if self.verbose:
                 print(
                     f"H|DataProcessor-{self.name}| received event: {eventData} from {sender.name}, and processed it to {processedData}")
             self.notify_observers(processedData)
+        elif isinstance(eventData, SomeDataBatch):
+            processedData = self.process_batch(eventData)
+            if self.verbose:
+                print(f"H|DataProcessor-{self.name}| received {eventData} from {sender.name}, and processed it to {processedData}")
+            self.notify_observers(processedData)
         else:
             raise ValueError(f"H|DataProcessor-{self.name}| received an unexpected event: {eventData} of type {type(eventData)}")
 
+    def handle_events_batch(self, sender, events):
+        """
+        batched mode: process the whole batch, then notify the listeners once with all the results.
+        """
+        processed = []
+        for eventData in events:
+            if eventData is Ellipsis and sender is self:
+                if self.verbose:
+                    print(f"H|DataProcessor-{self.name}| received shutdown signal")
+                continue
+            if isinstance(eventData, SomeDataBatch):
+                processed.append(self.process_batch(eventData))
+                continue
+            if not isinstance(eventData, SomeDataRecord):
+                raise ValueError(f"H|DataProcessor-{self.name}| received an unexpected event: {eventData} of type {type(eventData)}")
+            processed.append(type(eventData)(value=eventData.value * eventData.value + 1, source=self.name))
+        if self.verbose:
+            print(f"H|DataProcessor-{self.name}| processed a batch of {len(processed)} events from {sender.name}")
+        self.notify_observers_many(processed)
 
+    def process_batch(self, batch):
+        """the same transformation as for a single `SomeData`, vectorized over the whole batch."""
+        return SomeDataBatch.from_values(batch.values * batch.values + 1, source=self.name)
@@ -0,0 +1,122 @@
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from queue import Queue, Empty
+from .processorBasic import ExampleProcessor
+from .datatypes import SomeDataRecord, SomeDataBatch
+
+
+def square_plus_one(value):
+    """the transformation of `ExampleProcessor`."""
+    return value * value + 1
+
+
+def apply_to_chunk(function, values):
+    """runs in the worker process."""
+    return [function(value) for value in values]
+
+
+class ProcessPoolProcessor(ExampleProcessor):
+    """
+    Variant of `ExampleProcessor` that runs the CPU-heavy part in a pool of worker processes, out of reach of the GIL.
+
+    Only the plain `value`s travel to the workers and back, so the pickling cost does not depend on the `SomeData` class;
+    the results are wrapped into fresh records, of the type of the received ones, on return.
+    The futures are collected in submission order by the internal event thread, which then notifies the observers;
+    hence, the results come out in the original order of the events.
+
+    The values are sent to the workers in chunks of up to `chunk_size`, taken from the batch being handled; so chunking only
+    pays off in batched mode - per event, each event goes to the pool on its own, whatever `chunk_size`.
+    A `SomeDataBatch` goes to the pool as one chunk, and comes back as one `SomeDataBatch`.
+    A chunk failing in the pool - say `function` raising - is reported, and its results are lost; the other ones still go out.
+
+    `function` must be picklable, i.e. defined at module level.
+    Several processors can share one `executor`; otherwise, each owns a pool of `processes` workers.
+    """
+    generates_internal_events = True
+
+    def __init__(self, name='unsetPoolProcessor', verbose=False,
+                 function=square_plus_one, processes=None, chunk_size=256, executor=None, **kwargs):
+        super().__init__(name=name, verbose=verbose, **kwargs)
+        self.function = function
+        self.chunk_size = chunk_size
+        self._owns_executor = executor is None
+        self.executor = ProcessPoolExecutor(max_workers=processes) if executor is None else executor
+        # (future, record type) in submission order; None marks the end.
+        self.pending_results = Queue()
+
+    def internal_generate_events(self):
+        while True:
+            # the end is the None put by the shutdown signal, after the last chunk; but should the events stop being handled
+            # without it - an exception ending the incoming_event_thread - the results pending by then are the last ones.
+            incoming_done = self.please_shutdown and self._incoming_done()
+            try:
+                pending = self.pending_results.get(timeout=0.1)
+            except Empty:
+                if incoming_done:
+                    break
+                continue
+            if pending is None:
+                break
+            future, record_type = pending
+            try:
+                values = future.result()
+            except Exception:
+                traceback.print_exc()
+                continue
+            if record_type is SomeDataBatch:
+                processedData = [SomeDataBatch.from_values(values, source=self.name)]
+            else:
+                processedData = [record_type(value=value, source=self.name) for value in values]
+            if self.verbose:
+                print(f"I|DataProcessor-{self.name}| emitting {len(processedData)} processed events")
+            if self.batched:
+                self.notify_observers_many(processedData)
+            else:
+                for eventData in processedData:
+                    self.notify_observers(eventData)
+
+    def handle_events(self, sender, eventData):
+        self.handle_events_batch(sender, (eventData,))
+
+    def handle_events_batch(self, sender, events):
+        values = []
+        record_type = None
+        for eventData in events:
+            if eventData is Ellipsis and sender is self:
+                if self.verbose:
+                    print(f"H|DataProcessor-{self.name}| received shutdown signal")
+                self._submit(values, record_type)
+                values = []
+                self.pending_results.put(None)
+                continue
+            if isinstance(eventData, SomeDataBatch):
+                self._submit(values, record_type)
+                values, record_type = [], None
+                self._submit(eventData.values.tolist(), SomeDataBatch)
+                continue
+            if not isinstance(eventData, SomeDataRecord):
+                raise ValueError(f"H|DataProcessor-{self.name}| received an unexpected event: {eventData} of type {type(eventData)}")
+            if type(eventData) is not record_type:
+                self._submit(values, record_type)
+                values = []
+                record_type = type(eventData)
+            values.append(eventData.value)
+            if len(values) >= self.chunk_size:
+                self._submit(values, record_type)
+                values = []
+        self._submit(values, record_type)
+
+    def _submit(self, values, record_type):
+        if values:
+            self.pending_results.put((self.executor.submit(apply_to_chunk, self.function, values), record_type))
+
+    def _incoming_done(self):
+        """whether no more events will be handled, hence no more chunks submitted."""
+        if self.incoming_event_thread is not None:
+            return not self.incoming_event_thread.is_alive()
+        return self._mailbox_closed.is_set()
+
+    def stop(self):
+        super().stop()
+        if self._owns_executor:
+            self.executor.shutdown()
@@ -0,0 +1,336 @@
+import json
+import mmap
+import math
+import pickle
+import struct
+from .datatypes import SomeData, SomeDataBatch
+from .segments import segments_between, open_segment
+from . import logger_binary as binary_log
+
+# binary recording layout:
+#   header:  magic, record size, record count, offset of the source names
+#   records: fixed-width (timestamp, value, source id, flags), one after the other
+#   footer:  the source names, as a JSON list; the source id is the index in this list.
+# the value is an int64, or a float64 when the record has the FLOAT_VALUE flag.
+MAGIC = b'SOMEDAT1'
+HEADER = struct.Struct('<8sIIQQ')  # magic, record size, reserved, record count, sources offset
+RECORD = struct.Struct('<dqiI')  # timestamp, value, source id, flags; 24 bytes
+FLOAT_RECORD = struct.Struct('<ddiI')  # same, for the float values
+FLOAT_VALUE = 1
+VALUE_OFFSET = 8
+FLOAT_VALUE_FIELD = struct.Struct('<d')
+
+
+def pack_record(item, source_id):
+    """the bytes of the record for the item; a ValueError if its value is neither a float nor an int fitting int64."""
+    value = item.value
+    try:
+        if isinstance(value, float):
+            return FLOAT_RECORD.pack(item.timestamp, value, source_id, FLOAT_VALUE)
+        return RECORD.pack(item.timestamp, value, source_id, 0)
+    except struct.error:
+        raise ValueError(f"cannot record {item}: the value must be a float, or an int within int64") from None
+
+
+class BinaryRecordingWriter(object):
+    """
+    Writes `SomeData` records into the fixed-width binary format read by `BinaryRecordingSource`.
+    The values can be ints, within int64, or floats; anything else raises a ValueError, and is not written.
+    Use as a context manager, or call `close`; the file is not readable before that.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, 'wb')
+        self.file.write(HEADER.pack(MAGIC, RECORD.size, 0, 0, 0))  # patched on close
+        self.source_ids = {}
+        self.record_count = 0
+
+    def write(self, item):
+        source_id = self.source_ids.setdefault(item.source, len(self.source_ids))
+        self.file.write(pack_record(item, source_id))
+        self.record_count += 1
+
+    def write_many(self, items):
+        source_ids = self.source_ids
+        chunk = bytearray()
+        count = 0
+        for item in items:
+            source_id = source_ids.setdefault(item.source, len(source_ids))
+            chunk += pack_record(item, source_id)
+            count += 1
+        # all or nothing: on a value that cannot be recorded, none of the items are written.
+        self.file.write(chunk)
+        self.record_count += count
+
+    def close(self):
+        if self.file.closed:
+            return
+        sources_offset = self.file.tell()
+        self.file.write(json.dumps(list(self.source_ids)).encode('utf-8'))
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, RECORD.size, 0, self.record_count, sources_offset))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class BinaryRecordingSource(object):
+    """
+    Memory-mapped `data_source` for `DataReplay`, reading a file written by `BinaryRecordingWriter`.
+
+    Opening only reads the header and the source names, so it is near-instant whatever the size of the recording;
+    the records are then unpacked one at a time, straight from the mapped pages, so memory use stays constant.
+    Can be iterated over several times; `records(start, stop)` replays a range of records only.
+    """
+
+    def __init__(self, filename, record_type=SomeData):
+        self.filename = filename
+        self.record_type = record_type
+        with open(filename, 'rb') as file:
+            magic, record_size, _, self.record_count, sources_offset = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC or record_size != RECORD.size:
+                raise ValueError(f"{filename} is not a binary SomeData recording")
+            file.seek(sources_offset)
+            self.sources = tuple(json.loads(file.read().decode('utf-8')))
+
+    def __len__(self):
+        return self.record_count
+
+    def __iter__(self):
+        return self.records()
+
+    def records(self, start=0, stop=None):
+        stop = self.record_count if stop is None else min(stop, self.record_count)
+        if start >= stop:
+            return
+        record_type = self.record_type
+        sources = self.sources
+        with open(self.filename, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)[HEADER.size + start * RECORD.size:HEADER.size + stop * RECORD.size]
+            unpacked = RECORD.iter_unpack(view)
+            try:
+                for index, (timestamp, value, source_id, flags) in enumerate(unpacked):
+                    if flags & FLOAT_VALUE:
+                        value, = FLOAT_VALUE_FIELD.unpack_from(view, index * RECORD.size + VALUE_OFFSET)
+                    yield record_type(timestamp=timestamp, source=sources[source_id], value=value)
+            finally:
+                # the mapping can only be closed once nothing refers to its memory any more.
+                del unpacked
+                view.release()
+
+
+class JsonlRecordingSource(object):
+    """
+    Streaming `data_source` for `DataReplay`, reading back the files written by `LoggerJsonl`, one line at a time.
+    Only the `SomeData` events are replayed; the others were logged as plain strings and are skipped.
+
+    :param sender: if given, only the events logged from the sender of that name are replayed.
+    """
+
+    def __init__(self, filename, record_type=SomeData, sender=None):
+        self.filename = filename
+        self.record_type = record_type
+        self.sender = sender
+
+    def __iter__(self):
+        with open(self.filename, 'r') as file:
+            yield from self.parse_lines(file)
+
+    def parse_lines(self, lines):
+        record_type = self.record_type
+        for line in lines:
+            if not line.strip():
+                continue
+            eventPacket = json.loads(line)
+            if self.sender is not None and eventPacket['sender'] != self.sender:
+                continue
+            event = eventPacket['event']
+            if isinstance(event, dict):
+                yield record_type(**event)
+
+
+class JsonlSegmentsSource(JsonlRecordingSource):
+    """
+    Streaming `data_source` for `DataReplay`, reading back a segmented `LoggerJsonl` log, compressed or not.
+    With a time window, the manifest tells which segments to open; the others are not even looked at.
+
+    :param manifest_filename: the manifest of the segments, see `segments.manifest_filename_for`.
+    :param start_time: if given, the events timestamped before it are skipped.
+    :param end_time: if given, the events timestamped after it are skipped.
+    """
+
+    def __init__(self, manifest_filename, record_type=SomeData, sender=None, start_time=None, end_time=None):
+        super().__init__(manifest_filename, record_type=record_type, sender=sender)
+        self.start_time = start_time
+        self.end_time = end_time
+
+    def __iter__(self):
+        for path in segments_between(self.filename, self.start_time, self.end_time):
+            with open_segment(path) as file:
+                for eventData in self.parse_lines(file):
+                    if self.start_time is not None and eventData.timestamp < self.start_time:
+                        continue
+                    if self.end_time is not None and eventData.timestamp > self.end_time:
+                        continue
+                    yield eventData
+
+
+class BinaryLogSource(object):
+    """
+    Memory-mapped `data_source` for `DataReplay`, reading back a log written by `LoggerBinary`.
+
+    Opening reads the index only - or, if the logger did not close the file, walks the block headers.
+    The columns of the blocks are NumPy arrays viewing the mapped pages: `batches()` hands them over as
+    `SomeDataBatch` without copying anything, to replay a whole block per event; iterating gives `record_type` items.
+    The mapping stays open as long as the source, or any of the batches, is referenced.
+    Nothing read from the log is ever unpickled, unless `unpickle_events` is set: only do that for trusted logs.
+
+    :param sender: if given, only the events logged from the sender of that name are replayed.
+    :param start_time: if given, the events timestamped before it are skipped.
+    :param end_time: if given, the events timestamped after it are skipped.
+    :param all_events: also replay the events that are not `SomeData`; those without a timestamp are never skipped.
+        They come back as logged: as their string - or, logged with `pickle_events`, only with `unpickle_events`.
+    :param unpickle_events: all_events only; also replay the pickled events. Unpickling runs whatever code the log
+        tells it to: only ever set this for logs from a trusted source.
+    """
+
+    def __init__(self, filename, record_type=SomeData, sender=None, start_time=None, end_time=None, all_events=False,
+                 unpickle_events=False):
+        self.filename = filename
+        self.record_type = record_type
+        self.sender = sender
+        self.start_time = start_time
+        self.end_time = end_time
+        self.all_events = all_events
+        self.unpickle_events = unpickle_events
+        with open(filename, 'rb') as file:
+            self.mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = binary_log.FILE_HEADER.unpack_from(self.mapped, 0)
+        if magic != binary_log.MAGIC or version not in binary_log.VERSIONS:
+            raise ValueError(f"{filename} is not a binary event log")
+        self.blocks, self.sources, self.senders = self.read_index()
+        self.complete = self.blocks is not None
+        if not self.complete:
+            self.blocks, self.sources, self.senders = self.scan_blocks()
+        self.sources = tuple(self.sources)
+        self.sender_code = None if sender is None else (self.senders.index(sender) if sender in self.senders else -1)
+
+    def read_index(self):
+        """(blocks, sources, senders) from the index, or Nones if there is no index."""
+        if len(self.mapped) < binary_log.FILE_HEADER.size + binary_log.TRAILER.size:
+            return None, None, None
+        index_offset, magic = binary_log.TRAILER.unpack_from(self.mapped, len(self.mapped) - binary_log.TRAILER.size)
+        if magic != binary_log.MAGIC:
+            return None, None, None
+        kind, size, _, _, _ = binary_log.BLOCK_HEADER.unpack_from(self.mapped, index_offset)
+        start = index_offset + binary_log.BLOCK_HEADER.size
+        index = json.loads(bytes(self.mapped[start:start + size]))
+        return index['blocks'], index['sources'], index['senders']
+
+    def scan_blocks(self):
+        """rebuilds the index of a log that was not closed; a block cut short at the end is ignored."""
+        blocks, sources, senders = [], [], []
+        offset = binary_log.FILE_HEADER.size
+        while offset + binary_log.BLOCK_HEADER.size <= len(self.mapped):
+            kind, count, first_timestamp, last_timestamp, size = binary_log.BLOCK_HEADER.unpack_from(self.mapped, offset)
+            start = offset + binary_log.BLOCK_HEADER.size
+            if start + size > len(self.mapped):
+                break
+            if kind == binary_log.BLOCK_NAMES:
+                names = json.loads(bytes(self.mapped[start:start + size]))
+                sources.extend(names['sources'])
+                senders.extend(names['senders'])
+            elif kind != binary_log.BLOCK_INDEX:
+                blocks.append([offset, kind, count] +
+                              [None if math.isnan(timestamp) else timestamp for timestamp in (first_timestamp, last_timestamp)])
+            offset = start + size + binary_log.padding(size)
+        return blocks, sources, senders
+
+    def __len__(self):
+        """number of SomeData records in the log, before any filtering."""
+        return sum(count for _, kind, count, _, _ in self.blocks if kind in binary_log.RECORD_BLOCKS)
+
+    def __iter__(self):
+        record_type = self.record_type
+        sources = self.sources
+        for block in self.selected_blocks():
+            if block[1] in binary_log.EVENT_BLOCKS:
+                yield from self.block_events(block)
+                continue
+            timestamps, values, source_codes, int_flags = self.block_columns(block)
+            values = values.tolist()
+            if int_flags is not None:
+                values = [int(value) if is_int else value for value, is_int in zip(values, int_flags.tolist())]
+            for timestamp, code, value in zip(timestamps.tolist(), source_codes.tolist(), values):
+                yield record_type(timestamp=timestamp, source=sources[code], value=value)
+
+    def batches(self):
+        """
+        one `SomeDataBatch` per block, viewing the log; only blocks cut by the time window or sender filter are copied.
+        The values of the blocks holding float values are float64.
+        """
+        for block in self.selected_blocks():
+            if block[1] in binary_log.EVENT_BLOCKS:
+                continue
+            timestamps, values, source_codes, _ = self.block_columns(block)
+            if len(values):
+                yield SomeDataBatch(timestamps=timestamps, source_codes=source_codes, sources=self.sources, values=values)
+
+    def selected_blocks(self):
+        """the blocks that may hold events of the time window, in order."""
+        for block in self.blocks:
+            offset, kind, count, first_timestamp, last_timestamp = block
+            if kind == binary_log.BLOCK_EVENTS and not (self.all_events and self.unpickle_events):
+                continue
+            if first_timestamp is not None:
+                if self.end_time is not None and first_timestamp > self.end_time:
+                    continue
+                if self.start_time is not None and last_timestamp < self.start_time:
+                    continue
+            yield block
+
+    def block_columns(self, block):
+        """(timestamps, values, source codes, int flags) of a records block, filtered by sender and time window."""
+        offset, kind, count, first_timestamp, last_timestamp = block
+        timestamps, values, source_codes, sender_codes, int_flags = binary_log.record_columns(
+            self.mapped, offset + binary_log.BLOCK_HEADER.size, count, kind)
+        keep = None
+        if self.sender_code is not None:
+            keep = sender_codes == self.sender_code
+        if self.start_time is not None and first_timestamp < self.start_time:
+            keep = timestamps >= self.start_time if keep is None else keep & (timestamps >= self.start_time)
+        if self.end_time is not None and last_timestamp > self.end_time:
+            keep = timestamps <= self.end_time if keep is None else keep & (timestamps <= self.end_time)
+        if keep is None:
+            return timestamps, values, source_codes, int_flags
+        return timestamps[keep], values[keep], source_codes[keep], None if int_flags is None else int_flags[keep]
+
+    def block_events(self, block):
+        """the events of an events block; of a JSON one, only the `SomeData` unless `all_events`."""
+        offset, kind, count, _, _ = block
+        position = offset + binary_log.BLOCK_HEADER.size
+        for _ in range(count):
+            size, sender_code = binary_log.EVENT_HEADER.unpack_from(self.mapped, position)
+            position += binary_log.EVENT_HEADER.size
+            if self.sender_code is None or sender_code == self.sender_code:
+                encoded = self.mapped[position:position + size]
+                if kind == binary_log.BLOCK_EVENTS:
+                    eventData = pickle.loads(encoded)
+                else:
+                    eventData = json.loads(encoded)
+                    if isinstance(eventData, dict):
+                        eventData = self.record_type(**eventData)
+                    elif not self.all_events:
+                        position += size
+                        continue
+                timestamp = getattr(eventData, 'timestamp', None)
+                if type(timestamp) not in (int, float) or (
+                        (self.start_time is None or timestamp >= self.start_time) and
+                        (self.end_time is None or timestamp <= self.end_time)):
+                    yield eventData
+            position += size
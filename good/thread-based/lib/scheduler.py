@@ -0,0 +1,47 @@
+import threading
+from queue import Queue
+
+
+class Scheduler(object):
+    """
+    A fixed-size pool of worker threads, shared by many observables.
+
+    Observables created with `scheduler=...` do not own an incoming_event_thread; their event queue is a mailbox instead.
+    When a mailbox receives work, it puts itself into the ready queue, and whichever worker is free drains it.
+    A mailbox is in the ready queue at most once, hence each handler runs on at most one thread at a time,
+    and the events of one observable are handled in order.
+
+    Start the scheduler before stopping any of its observables, and stop it after all of them are stopped.
+    """
+
+    def __init__(self, name='scheduler', workers=4, throughput=64):
+        """
+        :param workers: number of worker threads.
+        :param throughput: max. queue entries handled per mailbox visit, before the worker moves on to the next mailbox.
+        """
+        self.name = name
+        self.throughput = throughput
+        self.ready_queue = Queue()
+        self.worker_threads = [threading.Thread(target=self.run_worker, name=f'{name}-worker-{idx}')
+                               for idx in range(workers)]
+
+    def start(self):
+        for thread in self.worker_threads:
+            thread.start()
+
+    def schedule(self, observable):
+        """called by the observables; puts a mailbox with pending work into the ready queue."""
+        self.ready_queue.put(observable)
+
+    def run_worker(self):
+        while True:
+            observable = self.ready_queue.get()  # blocks until some mailbox has work.
+            if observable is None:  # shutdown signal
+                return
+            observable.run_mailbox(self.throughput)
+
+    def stop(self):
+        for _ in self.worker_threads:
+            self.ready_queue.put(None)
+        for thread in self.worker_threads:
+            thread.join()
@@ -0,0 +1,175 @@
+import bz2
+import gzip
+import json
+import lzma
+import os
+import shutil
+import threading
+import time
+from queue import Queue
+
+# compression of the closed segments: codec name -> (file extension, open function)
+CODECS = {
+    'gzip': ('.gz', gzip.open),
+    'bz2': ('.bz2', bz2.open),
+    'lzma': ('.xz', lzma.open),
+}
+
+
+def manifest_filename_for(filename):
+    """'logs/eventLog.jsonl' -> 'logs/eventLog.jsonl.manifest.json'"""
+    return filename + '.manifest.json'
+
+
+def read_manifest(manifest_filename):
+    with open(manifest_filename, 'r') as f:
+        return json.load(f)['segments']
+
+
+def segments_between(manifest_filename, start_time=None, end_time=None):
+    """
+    paths of the segments that may hold events timestamped within [start_time, end_time], in order.
+    Segments without any timestamped event are always included, as nothing is known about them.
+    """
+    directory = os.path.dirname(manifest_filename)
+    paths = []
+    for segment in read_manifest(manifest_filename):
+        first_timestamp, last_timestamp = segment['first_timestamp'], segment['last_timestamp']
+        if first_timestamp is not None:
+            if end_time is not None and first_timestamp > end_time:
+                continue
+            if start_time is not None and last_timestamp < start_time:
+                continue
+        paths.append(os.path.join(directory, segment['filename']))
+    return paths
+
+
+def open_segment(path):
+    """opens a segment for reading text, compressed or not."""
+    for extension, open_function in CODECS.values():
+        if path.endswith(extension):
+            return open_function(path, 'rt')
+    return open(path, 'r')
+
+
+class SegmentedFile(object):
+    """
+    Text file split into numbered segments: 'eventLog.jsonl' is written as 'eventLog.00000.jsonl', 'eventLog.00001.jsonl', ...
+    A new segment is started once the current one holds `max_bytes`, or is `max_seconds` old.
+    The closed segments are optionally compressed by a background thread.
+
+    The manifest, next to the segments, lists them in order, each with the first and last timestamp of its events,
+    so that a replay can pick the segments of a time window without opening any of them.
+    Numbering continues from an existing manifest, so a restart does not clobber the previous segments.
+
+    Rolling over only happens in `roll_if_due`, which the writer calls between two complete records;
+    `write` never splits the text across segments.
+    """
+
+    def __init__(self, filename, max_bytes=None, max_seconds=None, compression=None):
+        if compression is not None and compression not in CODECS:
+            raise ValueError(f"compression must be one of {tuple(CODECS)}, got {compression}")
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.compression = compression
+        self.manifest_filename = manifest_filename_for(filename)
+        self.manifest_lock = threading.Lock()
+        self.segments = read_manifest(self.manifest_filename) if os.path.exists(self.manifest_filename) else []
+        self.compression_queue = Queue()
+        self.compression_thread = None
+        if compression is not None:
+            self.compression_thread = threading.Thread(target=self.run_compression, name=f'{filename}-compression')
+            self.compression_thread.start()
+        self.file = None
+        self.open_segment()
+
+    def segment_filename(self, index):
+        stem, extension = os.path.splitext(self.filename)
+        return f'{stem}.{index:05d}{extension}'
+
+    def open_segment(self):
+        index = len(self.segments)
+        path = self.segment_filename(index)
+        self.file = open(path, 'w')
+        self.segment_bytes = 0
+        self.segment_opened = time.monotonic()
+        with self.manifest_lock:
+            self.segments.append({'filename': os.path.basename(path), 'first_timestamp': None, 'last_timestamp': None,
+                                  'bytes': 0, 'closed': False})
+            self.write_manifest()
+
+    def close_segment(self):
+        self.file.close()
+        index = len(self.segments) - 1
+        with self.manifest_lock:
+            self.segments[index]['bytes'] = self.segment_bytes
+            self.segments[index]['closed'] = True
+            self.write_manifest()
+        if self.compression is not None:
+            self.compression_queue.put(index)
+
+    def write_manifest(self):
+        """called with the manifest lock held. Replaces the manifest atomically, so that readers never see half of it."""
+        temporary_filename = self.manifest_filename + '.tmp'
+        with open(temporary_filename, 'w') as f:
+            json.dump({'segments': self.segments}, f, indent=1)
+        os.replace(temporary_filename, self.manifest_filename)
+
+    def run_compression(self):
+        codec_extension, open_function = CODECS[self.compression]
+        while True:
+            index = self.compression_queue.get()
+            if index is None:
+                return
+            directory = os.path.dirname(self.filename)
+            with self.manifest_lock:
+                path = os.path.join(directory, self.segments[index]['filename'])
+            with open(path, 'rb') as source, open_function(path + codec_extension, 'wb') as target:
+                shutil.copyfileobj(source, target)
+            with self.manifest_lock:
+                self.segments[index]['filename'] += codec_extension
+                self.write_manifest()
+            os.remove(path)
+
+    def note_timestamps(self, first_timestamp, last_timestamp):
+        """extends the time range of the current segment."""
+        # under the lock: the compression thread may be writing the manifest out of the same list meanwhile.
+        with self.manifest_lock:
+            segment = self.segments[-1]
+            if segment['first_timestamp'] is None or first_timestamp < segment['first_timestamp']:
+                segment['first_timestamp'] = first_timestamp
+            if segment['last_timestamp'] is None or last_timestamp > segment['last_timestamp']:
+                segment['last_timestamp'] = last_timestamp
+
+    def roll_if_due(self):
+        if self.segment_bytes == 0:
+            return
+        if (self.max_bytes is not None and self.segment_bytes >= self.max_bytes) or \
+                (self.max_seconds is not None and time.monotonic() - self.segment_opened >= self.max_seconds):
+            self.close_segment()
+            self.open_segment()
+
+    def write(self, text):
+        self.file.write(text)
+        # counts characters; the same as bytes for the ASCII text of the loggers.
+        self.segment_bytes += len(text)
+
+    def flush(self):
+        self.file.flush()
+
+    def fileno(self):
+        return self.file.fileno()
+
+    @property
+    def closed(self):
+        return self.file.closed
+
+    def close(self):
+        """closes the last segment, and waits for all the compression to finish."""
+        if self.file.closed:
+            return
+        self.close_segment()
+        if self.compression_thread is not None:
+            self.compression_queue.put(None)
+            self.compression_thread.join()
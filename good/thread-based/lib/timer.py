@@ -1,20 +1,107 @@
+from collections import deque
 from .observable import Observable
 from .datatypes import SomeData
 import time
 
+# how the ticks are timed:
+SCHEDULE_SLEEP = 'sleep'  # sleep for the interval, then notify; each tick drifts by the time spent notifying.
+SCHEDULE_DEADLINE = 'deadline'  # wait until absolute monotonic deadlines, one interval apart; no cumulative drift.
+SCHEDULES = (SCHEDULE_SLEEP, SCHEDULE_DEADLINE)
+
+# deadline schedule only: what to do with the ticks whose deadline passed while notifying the previous one:
+MISSED_CATCH_UP = 'catch_up'  # fire them back to back, until on schedule again.
+MISSED_SKIP = 'skip'  # drop them, and carry on from the next deadline in the future.
+MISSED_POLICIES = (MISSED_CATCH_UP, MISSED_SKIP)
+
+
 class TimedEventSource(Observable):
-    def __init__(self, name='timer', interval=1.0, verbose=False):
-        super().__init__(name=name)
+    def __init__(self, name='timer', interval=1.0, verbose=False, record_type=SomeData,
+                 schedule=SCHEDULE_SLEEP, spin=0.0, missed_ticks=MISSED_CATCH_UP, jitter_window=10000,
+                 timer_service=None, **kwargs):
+        """
+        :param record_type: the type of the emitted events; any of the `SomeData` record types.
+        :param schedule: one of SCHEDULES.
+        :param spin: deadline schedule only; the last `spin` seconds before each deadline are busy-waited instead of slept,
+            trading CPU for sub-millisecond accuracy. A few hundred microseconds is usually enough.
+        :param missed_ticks: one of MISSED_POLICIES.
+        :param jitter_window: number of most recent ticks kept for `jitter_stats`.
+        :param timer_service: optional shared `TimerService`. When given, the service fires the ticks, on deadlines,
+            and this timer has no internal thread; `schedule` and `spin` are then those of the service.
+        """
+        if schedule not in SCHEDULES:
+            raise ValueError(f"schedule must be one of {SCHEDULES}, got {schedule}")
+        if missed_ticks not in MISSED_POLICIES:
+            raise ValueError(f"missed_ticks must be one of {MISSED_POLICIES}, got {missed_ticks}")
+        self.timer_service = timer_service
+        self.generates_internal_events = timer_service is None
+        super().__init__(name=name, **kwargs)
         self.interval = interval
         self.verbose = verbose
+        self.record_type = record_type
+        self.schedule = schedule
+        self.spin = spin
+        self.missed_ticks = missed_ticks
+        # lateness of each tick behind its deadline, in seconds; deadline schedule only.
+        self.lateness = deque(maxlen=jitter_window)
+        self.ticks_skipped = 0
+
+    def start(self):
+        super().start()
+        if self.timer_service is not None:
+            self.timer_service.register(self)
+
+    def stop(self):
+        if self.timer_service is not None:
+            self.timer_service.cancel(self)
+        super().stop()
 
     def internal_generate_events(self):
+        if self.schedule == SCHEDULE_DEADLINE:
+            self.generate_on_deadlines()
+            return
         while not self.please_shutdown:
             time.sleep(self.interval)
-            eventData = SomeData(value=self.interval)
-            if self.verbose:
-                print(f'timerEventSource|internal| creating event {eventData} and notifying observers')
-            self.notify_observers(eventData)
+            self.tick()
+
+    def generate_on_deadlines(self):
+        deadline = time.monotonic() + self.interval
+        while not self.please_shutdown:
+            self.wait_until(deadline)
+            self.lateness.append(time.monotonic() - deadline)
+            self.tick()
+
+            deadline += self.interval
+            behind = time.monotonic() - deadline
+            if behind > 0 and self.missed_ticks == MISSED_SKIP:
+                missed = int(behind // self.interval) + 1
+                deadline += missed * self.interval
+                self.ticks_skipped += missed
+                if self.verbose:
+                    print(f'timerEventSource|internal| skipped {missed} missed ticks')
+
+    def wait_until(self, deadline):
+        remaining = deadline - time.monotonic() - self.spin
+        if remaining > 0:
+            time.sleep(remaining)
+        while time.monotonic() < deadline:
+            pass
+
+    def tick(self):
+        eventData = self.record_type(value=self.interval)
+        if self.verbose:
+            print(f'timerEventSource|internal| creating event {eventData} and notifying observers')
+        self.notify_observers(eventData)
+
+    def jitter_stats(self):
+        """lateness percentiles over the recent ticks, in seconds, plus the number of skipped ticks."""
+        lateness = sorted(self.lateness)
+        if not lateness:
+            return {'ticks': 0, 'p50': None, 'p99': None, 'max': None, 'skipped': self.ticks_skipped}
+        return {'ticks': len(lateness),
+                'p50': lateness[int(0.50 * (len(lateness) - 1))],
+                'p99': lateness[int(0.99 * (len(lateness) - 1))],
+                'max': lateness[-1],
+                'skipped': self.ticks_skipped}
 
     def handle_events(self, sender, eventData):
         if eventData is not Ellipsis:
@@ -0,0 +1,108 @@
+import heapq
+import itertools
+import threading
+import time
+import traceback
+from .timer import MISSED_SKIP
+
+DEFAULT_SPIN = 0.0001  # enough to bring the lateness of the ticks down to about 1 us.
+
+
+class TimerService(object):
+    """
+    One dispatcher thread firing any number of `TimedEventSource`s, each on its own interval.
+
+    The pending deadlines are kept in a heap, so the cost of a tick does not depend on the number of timers,
+    and each timer costs one heap entry instead of one sleeping thread.
+    The deadlines are absolute and monotonic, as in the deadline schedule of `TimedEventSource`,
+    and each timer keeps its own `missed_ticks` policy and lateness statistics.
+
+    The ticks are fired on the dispatcher thread, one after the other: notifying must not block.
+    An observer with the OVERFLOW_BLOCK policy behind any of these timers holds up all of them while its queue is full,
+    so avoid it there. A tick raising an exception - say, an observer refusing the event - is reported, and that timer
+    carries on, as do the others.
+
+    Waking up from the condition wait is some 60 us late. Hence, by default, the dispatcher spins the last `spin` seconds
+    before each deadline, which brings the ticks to about 1 us, as accurate as a spinning thread per timer; that costs up
+    to `spin` seconds of CPU per tick. Set it to 0 to trade the accuracy for the CPU.
+    """
+
+    def __init__(self, name='timer-service', spin=DEFAULT_SPIN):
+        """
+        :param spin: the last `spin` seconds before each deadline are busy-waited instead of slept.
+        """
+        self.name = name
+        self.spin = spin
+        self.heap = []  # (deadline, sequence number, timer)
+        self.entries = {}  # timer -> sequence number of its live heap entry; other entries are stale.
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.please_shutdown = False
+        self.dispatcher_thread = threading.Thread(target=self.run_dispatcher, name=name)
+
+    def start(self):
+        self.dispatcher_thread.start()
+
+    def register(self, timer):
+        """starts firing `timer` every `timer.interval` seconds, from now on."""
+        with self.condition:
+            self._push(time.monotonic() + timer.interval, timer)
+            self.condition.notify()  # the new deadline may be the earliest one.
+
+    def cancel(self, timer):
+        with self.condition:
+            self.entries.pop(timer, None)  # its heap entry is discarded when it comes up.
+
+    def _push(self, deadline, timer):
+        sequence = next(self.sequence)
+        self.entries[timer] = sequence
+        heapq.heappush(self.heap, (deadline, sequence, timer))
+
+    def run_dispatcher(self):
+        while True:
+            with self.condition:
+                while True:
+                    if self.please_shutdown:
+                        return
+                    if not self.heap:
+                        self.condition.wait()
+                        continue
+                    deadline, sequence, timer = self.heap[0]
+                    if self.entries.get(timer) != sequence:
+                        heapq.heappop(self.heap)  # cancelled
+                        continue
+                    remaining = deadline - time.monotonic() - self.spin
+                    if remaining > 0:
+                        self.condition.wait(remaining)
+                        continue
+                    heapq.heappop(self.heap)
+                    break
+
+            # outside of the lock, so that registering is never held up by the spinning or the ticking.
+            while time.monotonic() < deadline:
+                pass
+            with self.condition:
+                # cancelled, or stopping, while spinning: no more ticks for this timer.
+                if self.please_shutdown or self.entries.get(timer) != sequence:
+                    continue
+            timer.lateness.append(time.monotonic() - deadline)
+            try:
+                timer.tick()
+            except Exception:
+                traceback.print_exc()  # the other timers must not stop ticking for this one.
+
+            deadline += timer.interval
+            behind = time.monotonic() - deadline
+            if behind > 0 and timer.missed_ticks == MISSED_SKIP:
+                missed = int(behind // timer.interval) + 1
+                deadline += missed * timer.interval
+                timer.ticks_skipped += missed
+            with self.condition:
+                if self.entries.get(timer) == sequence:  # not cancelled meanwhile
+                    self._push(deadline, timer)
+
+    def stop(self):
+        with self.condition:
+            self.please_shutdown = True
+            self.condition.notify()
+        self.dispatcher_thread.join()
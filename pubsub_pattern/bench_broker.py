@@ -0,0 +1,168 @@
+# Benchmark: publish rate of the Broker against the number of subscriptions, with and without wildcards.
+# The topics are 'site/<n>/device/<n>/temp'; each publish reaches one exact and two wildcard subscriptions.
+# Then, under contention: many publisher threads, while another thread keeps subscribing and unsubscribing;
+# the subscribers present all along must get every message exactly once.
+# Then the dispatch modes: publish latency with one slow subscriber (1 ms per message) next to fast ones.
+# Then the callback rate of a telemetry stream, per message, batched, and latest value only.
+# Last, a check: subscribing again to a topic whose only, weak, subscriber got collected.
+#
+# Usage:
+#   python bench_broker.py [number_of_publishes] [publisher_threads]
+
+import gc
+import sys
+import threading
+import time
+from collections import Counter
+
+from lib.broker import Broker, DISPATCH_MODES, DISPATCH_ORDERED, DELIVERY_EACH, DELIVERY_BATCH, DELIVERY_LATEST
+
+
+def callback(message):
+    pass
+
+
+def make_broker(number_of_subscriptions):
+    broker = Broker()
+    for idx in range(number_of_subscriptions):
+        broker.subscribe(f'site/{idx % 100}/device/{idx}/temp', callback)
+    broker.subscribe('site/+/device/+/temp', callback)
+    broker.subscribe('site/#', callback)
+    return broker
+
+
+def run(broker, topics, number_of_publishes):
+    start_time = time.perf_counter()
+    for idx in range(number_of_publishes):
+        broker.publish(topics[idx % len(topics)], idx)
+    return number_of_publishes / (time.perf_counter() - start_time)
+
+
+def run_contended(number_of_publishes, publisher_threads):
+    broker = make_broker(1000)
+    received = Counter()  # (subscriber, message) -> number of deliveries
+    received_lock = threading.Lock()
+
+    def subscriber(name):
+        def on_message(message):
+            with received_lock:
+                received[name, message] += 1
+        return on_message
+
+    broker.subscribe('site/+/device/+/temp', subscriber('steady wildcard'))
+    broker.subscribe('site/1/device/1/temp', subscriber('steady exact'))
+    done = threading.Event()
+
+    def churn():
+        churning = subscriber('churning')
+        changes = 0
+        while not done.is_set():
+            broker.subscribe('site/#', churning)
+            broker.unsubscribe('site/#', churning)
+            changes += 2
+        return changes
+
+    def publish(offset):
+        for idx in range(offset, number_of_publishes, publisher_threads):
+            broker.publish('site/1/device/1/temp', idx)
+
+    churn_result = []
+    churn_thread = threading.Thread(target=lambda: churn_result.append(churn()))
+    publishers = [threading.Thread(target=publish, args=(offset,)) for offset in range(publisher_threads)]
+    churn_thread.start()
+    start_time = time.perf_counter()
+    for thread in publishers:
+        thread.start()
+    for thread in publishers:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+    done.set()
+    churn_thread.join()
+
+    for name in ('steady wildcard', 'steady exact'):
+        counts = [received[name, idx] for idx in range(number_of_publishes)]
+        print(f'  {name:16}: {counts.count(0):,} lost, {sum(count > 1 for count in counts):,} duplicated')
+    print(f'  {number_of_publishes / elapsed:,.0f} publishes/sec, over {churn_result[0]:,} subscription changes')
+
+
+def run_dispatch(dispatch, number_of_messages):
+    broker = Broker(dispatch=dispatch, workers=4)
+    broker.subscribe('site/1/device/1/temp', lambda message: time.sleep(0.001))
+    for _ in range(3):
+        broker.subscribe('site/+/device/+/temp', callback)
+    latencies = []
+    start_time = time.perf_counter()
+    for idx in range(number_of_messages):
+        publish_time = time.perf_counter()
+        broker.publish('site/1/device/1/temp', idx)
+        latencies.append(time.perf_counter() - publish_time)
+    broker.stop()  # waits for all the deliveries.
+    elapsed = time.perf_counter() - start_time
+    latencies.sort()
+    print(f'  {dispatch:10}: publish latency p50 {latencies[len(latencies) // 2] * 1e6:8.1f} us, '
+          f'p99 {latencies[int(0.99 * (len(latencies) - 1))] * 1e6:8.1f} us; all delivered after {elapsed:.2f} s')
+
+
+def run_delivery(label, delivery, batch_size, number_of_messages):
+    """a 0.1 ms subscriber behind ordered dispatch, fed by a publisher that does not wait for it."""
+    broker = Broker(dispatch=DISPATCH_ORDERED, workers=2)
+    calls = []
+    broker.subscribe('tick', lambda message: (calls.append(message), time.sleep(0.0001)), delivery=delivery)
+    messages = list(range(number_of_messages))
+    start_time = time.perf_counter()
+    for idx in range(0, number_of_messages, batch_size):
+        broker.publish_many('tick', messages[idx:idx + batch_size])
+    broker.stop()
+    elapsed = time.perf_counter() - start_time
+    last = calls[-1][-1] if delivery == DELIVERY_BATCH else calls[-1]
+    print(f'  {label:34}: {len(calls):8,} callback calls, last message seen {last:,}, done in {elapsed:.2f} s')
+
+
+def run_resubscribe_after_collect():
+    """the pruning of the dead subscriber must not take the levels of the topic away from under the new one."""
+    broker = Broker()
+
+    class Subscriber(object):
+        def on_message(self, message):
+            pass
+
+    subscriber = Subscriber()
+    broker.subscribe('x/y', subscriber.on_message, weak=True)
+    del subscriber
+    gc.collect()
+    received = []
+    broker.subscribe('x/y', received.append)
+    broker.publish('x/y', 1)
+    counts = broker.subscription_counts()
+    print(f'  received {received}, subscriptions {counts}')
+    assert received == [1] and counts['live'] == 1, 'the new subscription was lost'
+
+
+if __name__ == '__main__':
+    number_of_publishes = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    publisher_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    print(f'{number_of_publishes:,} publishes')
+    for number_of_subscriptions in (100, 10_000, 50_000):
+        broker = make_broker(number_of_subscriptions)
+        topics = [f'site/{idx % 100}/device/{idx}/temp' for idx in range(0, number_of_subscriptions, max(1, number_of_subscriptions // 100))]
+        cached = run(broker, topics, number_of_publishes)
+        broker.match_cache_size = 1  # from now on, every publish misses the cache, and walks the trie.
+        broker.subscriptions_changed()
+        uncached = run(broker, topics, number_of_publishes)
+        print(f'{number_of_subscriptions:7,} subscriptions: {cached:12,.0f} publishes/sec cached, {uncached:12,.0f} walking the trie')
+
+    print(f'{publisher_threads} publisher threads, one thread subscribing and unsubscribing:')
+    run_contended(number_of_publishes, publisher_threads)
+
+    print('dispatch modes, 1000 messages, one subscriber taking 1 ms per message:')
+    for dispatch in DISPATCH_MODES:
+        run_dispatch(dispatch, 1000)
+
+    print('100,000 messages on one topic, subscriber taking 0.1 ms per call, ordered dispatch:')
+    run_delivery('publish, per message', DELIVERY_EACH, 1, 100_000)
+    run_delivery('publish_many of 100, batch', DELIVERY_BATCH, 100, 100_000)
+    run_delivery('publish, batch', DELIVERY_BATCH, 1, 100_000)
+    run_delivery('publish, latest value only', DELIVERY_LATEST, 1, 100_000)
+
+    print('subscribing again after the only, weak, subscriber of the topic got collected:')
+    run_resubscribe_after_collect()
@@ -31,8 +31,9 @@ class TimeprintAgent(Agent):
     def __init__(self, _broker=None):
         self.name = 'TimeprintAgent'
         self._broker = _broker
-        self._broker.subscribe('tick',  self.on_message)
-        self._broker.subscribe('pleaseStop', self.on_stop)
+        # weak subscriptions: dropping the agent without unsubscribing does not leave it behind in the broker.
+        self._broker.subscribe('tick',  self.on_message, weak=True)
+        self._broker.subscribe('pleaseStop', self.on_stop, weak=True)
 
     def on_message(self,  message):
         print(f'{self.name} received {message}')
@@ -40,7 +41,7 @@ class TimeprintAgent(Agent):
     def on_stop(self, message):
         print(f'TimeprintAgent stops due to : {message}')
         self._broker.unsubscribe('tick', self.on_message)
-        self._broker.unsubscribe('pleaseStop', self.on_message)
+        self._broker.unsubscribe('pleaseStop', self.on_stop)
 
     def run(self):
         pass
@@ -52,3 +53,4 @@ printer = TimeprintAgent(broker)
 
 time.sleep(3)
 broker.publish('pleaseStop', "end of simulation.")
+print(f'subscriptions: {broker.subscription_counts()}')
@@ -1,5 +1,10 @@
+import inspect
 import threading
 import time
+import traceback
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from queue import Queue
 from abc import ABC, abstractmethod
 from typing import Callable, ClassVar
@@ -8,37 +13,381 @@ from attr import dataclass, field
 
 Broker = ClassVar
 
+# topics are split in levels on '/'. In a subscription, a level can be a wildcard:
+SINGLE_LEVEL_WILDCARD = '+'  # matches exactly one level: 'sensor/+/temp' matches 'sensor/kitchen/temp'.
+MULTI_LEVEL_WILDCARD = '#'  # last level only; matches any number of levels, even none: 'sensor/#' matches 'sensor'.
+TOPIC_SEPARATOR = '/'
+
+# how publish delivers the messages to the callbacks:
+DISPATCH_SYNC = 'sync'  # inline, on the thread of the publisher; publish returns once every callback has returned.
+DISPATCH_ORDERED = 'ordered'  # each subscription has a mailbox, drained on the pool; every callback sees its messages in order.
+DISPATCH_UNORDERED = 'unordered'  # every delivery is a task on the pool; the messages can overtake each other.
+DISPATCH_MODES = (DISPATCH_SYNC, DISPATCH_ORDERED, DISPATCH_UNORDERED)
+
+# what a subscription asks to receive, per callback call:
+DELIVERY_EACH = 'each'  # one message.
+DELIVERY_BATCH = 'batch'  # a list of messages: those of one `publish_many`, or whatever piled up in the mailbox meanwhile.
+DELIVERY_LATEST = 'latest'  # one message, the most recent one; those superseded before the callback got to them are dropped.
+DELIVERY_MODES = (DELIVERY_EACH, DELIVERY_BATCH, DELIVERY_LATEST)
+
 @dataclass
 class Agent(ABC):
     broker: Broker = None
     pass
 
 
+class WeakCallback(object):
+    """
+    calls a callback through a weak reference, so that the subscription does not keep it alive;
+    a bound method through a `WeakMethod`, so that it is its object that can be collected. Once it is, calls do nothing.
+    """
+    __slots__ = ('ref',)
+
+    def __init__(self, callback, on_dead):
+        self.ref = (weakref.WeakMethod if inspect.ismethod(callback) else weakref.ref)(callback, on_dead)
+
+    def __call__(self, message):
+        callback = self.ref()
+        if callback is not None:
+            callback(message)
+
+
 @dataclass
 class Subscription:
-    callback: Callable
+    callback: Callable  # a `WeakCallback`, for the weak subscriptions.
+    sequence: int = 0  # order of subscribing; the matching subscriptions are called in this order.
+    delivery: str = DELIVERY_EACH
+    weak: bool = False
+    # async dispatch: the messages waiting for the callback, and whether a drain of them is under way.
+    mailbox: deque = field(factory=deque, eq=False, repr=False)
+    mailbox_lock: object = field(factory=threading.Lock, eq=False, repr=False)
+    mailbox_scheduled: bool = field(default=False, eq=False, repr=False)
+
+    def target(self):
+        """the callback as subscribed; None once a weak one has been collected."""
+        return self.callback.ref() if self.weak else self.callback
+
+
+@dataclass
+class TopicNode:
+    """
+    one level of the topic trie: the subscriptions ending at this level, and the next levels by name.
+    The subscriptions are a tuple, replaced as a whole on change, never modified in place.
+    """
+    subscriptions: tuple = ()
+    children: dict = field(factory=dict)
+
+
+def topic_levels(topic, allow_wildcards):
+    levels = topic.split(TOPIC_SEPARATOR)
+    for index, level in enumerate(levels):
+        if SINGLE_LEVEL_WILDCARD not in level and MULTI_LEVEL_WILDCARD not in level:
+            continue
+        if not allow_wildcards:
+            raise ValueError(f"cannot publish to a topic with wildcards, got {topic!r}")
+        if level == SINGLE_LEVEL_WILDCARD or (level == MULTI_LEVEL_WILDCARD and index == len(levels) - 1):
+            continue
+        raise ValueError(f"a wildcard must be a whole level, and '#' the last one, got {topic!r}")
+    return levels
 
 
 class Broker(object):
-    def __init__(self):
-        # topics is a dict with key->list of Subscription.
-        self.topics: dict[str, list[Subscription]] = {}
-
-    def subscribe(self, topic, callback):
-        # get the list and extend it, and if not, create a fresh one.
-        subscriptions = self.topics.get(topic, [])
-        subscription = Subscription(callback=callback)
-        subscriptions.append(subscription)
-        self.topics[topic] = subscriptions
+    """
+    Topics are hierarchical, 'sensor/kitchen/temp'; subscriptions can use the wildcards '+' and '#', like MQTT.
+    The subscriptions are indexed in a trie of topic levels, so that matching a topic walks its levels
+    instead of looking at every subscription. The matches are then cached per topic;
+    any subscribe or unsubscribe empties the cache.
+
+    Thread-safe, copy-on-write: subscribe and unsubscribe take the lock, and never modify a tuple of subscriptions
+    in place, they replace it. So `publish` takes no lock at all; each call works on a snapshot of the matches,
+    which also means that a callback unsubscribed while a publish is in progress may still get that one message.
+
+    A subscription made with `weak=True` does not keep its callback alive - for a bound method, its object.
+    Once the callback is collected, the subscription is dead: it is skipped, and pruned by the next publish,
+    subscribe or unsubscribe. `subscription_counts` tells how many are live, dead and pruned so far.
+
+    With an async `dispatch`, publish only hands the message over to the callbacks, which then run on a shared pool
+    of worker threads - or, given a `loop`, on an asyncio event loop - so that a slow subscriber holds up neither
+    the publisher nor the other subscribers. The exceptions raised by the callbacks are then printed, not raised.
+    Call `stop` to wait for the pending deliveries, and release the pool.
+
+    :param match_cache_size: the cache is emptied when it holds that many topics, to bound its memory use.
+    :param dispatch: one of DISPATCH_MODES.
+    :param workers: size of the pool of the async dispatch, unless an `executor` is given.
+    :param executor: optional shared `concurrent.futures.Executor`, instead of a pool of this broker's own.
+    :param loop: optional asyncio event loop, to run the callbacks on instead of a pool; they then run one at a time.
+    :param throughput: max. callback calls per mailbox visit, before the worker moves on to the next mailbox.
+    """
+
+    def __init__(self, match_cache_size=100_000, dispatch=DISPATCH_SYNC, workers=4, executor=None, loop=None, throughput=64):
+        if dispatch not in DISPATCH_MODES:
+            raise ValueError(f"dispatch must be one of {DISPATCH_MODES}, got {dispatch}")
+        # topics is a dict with key->tuple of Subscription; the keys can have wildcards.
+        self.topics: dict[str, tuple[Subscription, ...]] = {}
+        self.root = TopicNode()
+        self.match_cache: dict[str, tuple[Subscription, ...]] = {}
+        self.match_cache_size = match_cache_size
+        self.lock = threading.Lock()  # serializes the changes of the subscriptions; publish only takes it to prune.
+        self.sequence = 0
+        # set from the weak reference callbacks, which may run on any thread, at any time - so they only set this flag.
+        self.prune_needed = False
+        self.pruned = 0
+        self.dispatch = dispatch
+        self.throughput = throughput
+        self.loop = loop
+        self._owns_executor = False
+        if dispatch != DISPATCH_SYNC and loop is None and executor is None:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='broker-dispatch')
+            self._owns_executor = True
+        self.executor = executor
+        # number of deliveries handed over and not done yet, for `wait_idle`.
+        self.pending_deliveries = 0
+        self.idle = threading.Condition()
+
+    def subscribe(self, topic, callback, delivery=DELIVERY_EACH, weak=False):
+        """
+        :param delivery: one of DELIVERY_MODES. With DELIVERY_LATEST, a slow subscriber skips to the latest message;
+            with async dispatch, at most one message per such subscription is ever waiting.
+        :param weak: hold the callback through a weak reference only. Not for lambdas and other throwaway callables,
+            which would be collected, and unsubscribed, right away.
+        """
+        if delivery not in DELIVERY_MODES:
+            raise ValueError(f"delivery must be one of {DELIVERY_MODES}, got {delivery}")
+        levels = topic_levels(topic, allow_wildcards=True)
+        with self.lock:
+            # first: pruning may remove the very levels walked below, which would leave the subscription detached.
+            if self.prune_needed:
+                self.prune_dead()
+            node = self.root
+            for level in levels:
+                node = node.children.setdefault(level, TopicNode())
+            self.sequence += 1
+            if weak:
+                callback = WeakCallback(callback, self.callback_died)
+            subscription = Subscription(callback=callback, sequence=self.sequence, delivery=delivery, weak=weak)
+            node.subscriptions = node.subscriptions + (subscription,)
+            # get the tuple and extend it, and if not, create a fresh one.
+            self.topics[topic] = self.topics.get(topic, ()) + (subscription,)
+            self.subscriptions_changed()
         return None
 
     def unsubscribe(self, topic, callback):
-        subscriptions = self.topics.get(topic, [])
-        for item in subscriptions:
-            if item.callback == callback:
-                subscriptions.remove(item)
+        levels = topic_levels(topic, allow_wildcards=True)
+        with self.lock:
+            if self.prune_needed:
+                self.prune_dead()
+            if topic not in self.topics:
+                return None
+            self.remove_subscriptions(topic, levels, lambda item: item.target() != callback)
+            self.subscriptions_changed()
         return None
 
+    def remove_subscriptions(self, topic, levels, keep):
+        """called with the lock held; drops the subscriptions of a topic for which `keep` is false."""
+        path = [self.root]
+        for level in levels:
+            path.append(path[-1].children[level])
+        path[-1].subscriptions = tuple(item for item in path[-1].subscriptions if keep(item))
+        remaining = tuple(item for item in self.topics[topic] if keep(item))
+        if remaining:
+            self.topics[topic] = remaining
+            return
+        del self.topics[topic]
+        # prune the levels left with neither subscriptions nor children.
+        for parent, node, level in reversed(list(zip(path, path[1:], levels))):
+            if node.subscriptions or node.children:
+                break
+            del parent.children[level]
+
+    def callback_died(self, reference):
+        self.prune_needed = True
+
+    def prune(self):
+        """removes the dead weak subscriptions now; returns how many there were."""
+        with self.lock:
+            return self.prune_dead()
+
+    def prune_dead(self):
+        """called with the lock held."""
+        self.prune_needed = False
+        pruned = 0
+        for topic, subscriptions in list(self.topics.items()):
+            dead = sum(1 for item in subscriptions if item.target() is None)
+            if dead:
+                self.remove_subscriptions(topic, topic.split(TOPIC_SEPARATOR), lambda item: item.target() is not None)
+                pruned += dead
+        if pruned:
+            self.pruned += pruned
+            self.subscriptions_changed()
+        return pruned
+
+    def subscription_counts(self):
+        """number of live subscriptions, of dead ones not pruned yet, and of those pruned so far."""
+        live = dead = 0
+        for subscriptions in list(self.topics.values()):
+            for item in subscriptions:
+                if item.target() is None:
+                    dead += 1
+                else:
+                    live += 1
+        return {'live': live, 'dead': dead, 'pruned': self.pruned}
+
+    def subscriptions_changed(self):
+        """called with the lock held, once the trie is up to date: the matches cached so far are all dropped at once."""
+        self.match_cache = {}
+
+    def match(self, topic):
+        """the subscriptions matching a topic, in order of subscribing."""
+        # a publish racing with a change may compute its matches from the trie before the change;
+        # it then stores them in the cache it started with, which the change has already replaced.
+        match_cache = self.match_cache
+        matches = match_cache.get(topic)
+        if matches is not None:
+            return matches
+        found = []
+        self.collect(self.root, topic_levels(topic, allow_wildcards=False), 0, found)
+        found.sort(key=lambda subscription: subscription.sequence)
+        matches = tuple(found)
+        if len(match_cache) >= self.match_cache_size:
+            match_cache.clear()
+        match_cache[topic] = matches
+        return matches
+
+    def collect(self, node, levels, index, found):
+        """walks down the trie along the levels of the topic, following the wildcard branches too."""
+        children = node.children
+        multi_level = children.get(MULTI_LEVEL_WILDCARD)
+        if multi_level is not None:
+            found.extend(multi_level.subscriptions)  # whatever the remaining levels, even none.
+        if index == len(levels):
+            found.extend(node.subscriptions)
+            return
+        child = children.get(levels[index])
+        if child is not None:
+            self.collect(child, levels, index + 1, found)
+        single_level = children.get(SINGLE_LEVEL_WILDCARD)
+        if single_level is not None:
+            self.collect(single_level, levels, index + 1, found)
+
     def publish(self, topic, message):
-        for subscription in self.topics.get(topic, []):
+        if self.prune_needed:
+            self.prune()
+        if self.dispatch != DISPATCH_SYNC:
+            self.publish_many(topic, (message,))
+            return
+        for subscription in self.match(topic):
+            subscription.callback([message] if subscription.delivery == DELIVERY_BATCH else message)
+
+    def publish_many(self, topic, messages):
+        """
+        Publishes a sequence of messages to one topic, matching the topic once for all of them.
+        The batch subscriptions get the whole sequence in a single call, and the latest-value ones only its last message.
+        Any iterable will do, a generator included: it is read once, up front.
+        """
+        if self.prune_needed:
+            self.prune()
+        messages = tuple(messages)
+        subscriptions = self.match(topic)
+        if not subscriptions or not messages:
+            return
+        if self.dispatch == DISPATCH_SYNC:
+            for subscription in subscriptions:
+                if subscription.delivery == DELIVERY_EACH:
+                    for message in messages:
+                        subscription.callback(message)
+                elif subscription.delivery == DELIVERY_BATCH:
+                    subscription.callback(list(messages))
+                else:
+                    subscription.callback(messages[-1])
+            return
+        with self.idle:
+            self.pending_deliveries += len(subscriptions) * len(messages)
+        for subscription in subscriptions:
+            if self.dispatch == DISPATCH_ORDERED or subscription.delivery == DELIVERY_LATEST:
+                self.post(subscription, messages)
+            elif subscription.delivery == DELIVERY_BATCH:
+                self.submit(self.deliver, subscription, list(messages), len(messages))
+            else:
+                for message in messages:
+                    self.submit(self.deliver, subscription, message)
+
+    def post(self, subscription, messages):
+        """puts the messages into the mailbox of the subscription, and gets the mailbox drained, unless it already is."""
+        superseded = 0
+        with subscription.mailbox_lock:
+            if subscription.delivery == DELIVERY_LATEST:
+                superseded = len(subscription.mailbox) + len(messages) - 1
+                subscription.mailbox.clear()
+                subscription.mailbox.append(messages[-1])
+            else:
+                subscription.mailbox.extend(messages)
+            schedule = not subscription.mailbox_scheduled
+            subscription.mailbox_scheduled = True
+        if superseded:
+            self.deliveries_done(superseded)
+        if schedule:
+            self.submit(self.drain_mailbox, subscription)
+
+    def submit(self, function, *args):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(function, *args)
+        else:
+            self.executor.submit(function, *args)
+
+    def deliver(self, subscription, message, count=1):
+        """calls the callback with one message, or with a list of `count` messages for a batch subscription."""
+        try:
             subscription.callback(message)
+        except Exception:
+            traceback.print_exc()
+        self.deliveries_done(count)
+
+    def drain_mailbox(self, subscription):
+        """
+        makes at most `throughput` callback calls, then either goes idle, or submits itself again.
+        A mailbox is drained by one worker at a time, hence its callback sees the messages in order.
+        A batch subscription gets the whole content of the mailbox in each call.
+        """
+        calls = 0
+        delivered = 0
+        while calls < self.throughput:
+            with subscription.mailbox_lock:
+                if not subscription.mailbox:
+                    subscription.mailbox_scheduled = False
+                    break
+                if subscription.delivery == DELIVERY_BATCH:
+                    message = list(subscription.mailbox)
+                    subscription.mailbox.clear()
+                    count = len(message)
+                else:
+                    message = subscription.mailbox.popleft()
+                    count = 1
+            try:
+                subscription.callback(message)
+            except Exception:
+                traceback.print_exc()
+            calls += 1
+            delivered += count
+        else:
+            # more may be waiting; go to the back of the queue, so that the other mailboxes get their turn.
+            self.submit(self.drain_mailbox, subscription)
+        self.deliveries_done(delivered)
+
+    def deliveries_done(self, count):
+        with self.idle:
+            self.pending_deliveries -= count
+            if not self.pending_deliveries:
+                self.idle.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """waits until every message published so far has been delivered; returns False on timeout."""
+        with self.idle:
+            return self.idle.wait_for(lambda: not self.pending_deliveries, timeout)
+
+    def stop(self):
+        """waits for the pending deliveries, then shuts down the pool if the broker created it."""
+        if self.dispatch == DISPATCH_SYNC:
+            return
+        self.wait_idle()
+        if self._owns_executor:
+            self.executor.shutdown(wait=True)
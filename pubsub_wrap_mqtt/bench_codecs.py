@@ -0,0 +1,86 @@
+# Benchmark: encode and decode cost per message of the payload codecs, for a SomeData-shaped record;
+# then delivering to several subscribers of a topic, each decoding the payload itself, against decoding it once for all.
+#
+# Usage:
+#   python bench_codecs.py [number_of_messages] [number_of_subscribers]
+
+import pickle
+import sys
+import time
+
+from lib.codec import DataRecord, JsonCodec, RecordCodec, decoded_messages
+from lib.transport import Subscription
+
+
+class PickleCodec(object):
+    """for reference only: pickle is no format for messages from other processes, let alone other hosts."""
+
+    def encode(self, message):
+        return pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, payload):
+        return pickle.loads(payload)
+
+
+def per_message(function, items):
+    start_time = time.perf_counter()
+    for item in items:
+        function(item)
+    return (time.perf_counter() - start_time) / len(items)
+
+
+def run_codec(label, codec, records):
+    payloads = [codec.encode(record) for record in records]
+    encode = per_message(codec.encode, records)
+    decode = per_message(codec.decode, payloads)
+    assert codec.decode(payloads[-1]) in (records[-1], pickle.loads(pickle.dumps(records[-1])),
+                                          {'timestamp': records[-1].timestamp, 'source': records[-1].source,
+                                           'value': records[-1].value})
+    size = sum(len(payload) for payload in payloads) / len(payloads)
+    print(f'{label:40}: encode {encode * 1e9:7,.0f} ns, decode {decode * 1e9:7,.0f} ns, {size:5.1f} bytes per message')
+
+
+def run_fan_out(codec, payloads, number_of_subscribers):
+    """ns per message, for all the subscribers: each decoding the raw payload, and the transport decoding once."""
+    count = [0]
+
+    def callback(message):
+        count[0] += 1
+
+    raw = [Subscription(topic='bench', subscriberName=f'raw{idx}', callback=lambda payload: callback(codec.decode(payload)))
+           for idx in range(number_of_subscribers)]
+    shared = [Subscription(topic='bench', subscriberName=f'shared{idx}', callback=callback, codec=codec)
+              for idx in range(number_of_subscribers)]
+
+    def deliver_raw(payload):
+        for subscription in raw:
+            subscription.callback(payload)
+
+    def deliver_shared(payload):
+        for subscription, message in decoded_messages(shared, payload):
+            subscription.callback(message)
+
+    return per_message(deliver_raw, payloads), per_message(deliver_shared, payloads)
+
+
+if __name__ == '__main__':
+    number_of_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    number_of_subscribers = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    records = [DataRecord(source='TimeTickAgent', value=idx) for idx in range(number_of_messages)]
+    print(f'{number_of_messages:,} records')
+
+    payloads = [str(record.value).encode('ascii') for record in records]
+    encode = per_message(lambda record: str(record.value).encode('ascii'), records)
+    decode = per_message(lambda payload: int(payload.decode('utf-8')), payloads)
+    print(f'{"bare value, as published before":40}: encode {encode * 1e9:7,.0f} ns, decode {decode * 1e9:7,.0f} ns '
+          f'- no timestamp, no source')
+    run_codec('JsonCodec', JsonCodec(), records)
+    run_codec('RecordCodec', RecordCodec(), records)
+    run_codec('pickle, for reference', PickleCodec(), records)
+
+    codec = RecordCodec()
+    payloads = [codec.encode(record) for record in records]
+    print(f'{number_of_subscribers} subscribers of one topic, RecordCodec:')
+    each, once = run_fan_out(codec, payloads, number_of_subscribers)
+    print(f'{"each subscriber decoding":40}: {each * 1e9:7,.0f} ns per message')
+    print(f'{"decoded once, shared":40}: {once * 1e9:7,.0f} ns per message')
@@ -0,0 +1,280 @@
+# Benchmark: messages/sec published through the BrokerWrapper, direct and pipelined, QoS 0 and 1,
+# against a minimal in-process MQTT 3.1.1 broker, over a real TCP connection on localhost.
+# A message counts once the broker has received it - and, with QoS 1, the wrapper has its PUBACK.
+# Then the receiving side: a fast subscriber next to a slow one (5 ms per message), callbacks on the network thread
+# or on the dispatch pool.
+# Last, one message at a time from publish to callback, through MQTT and through the in-process transport;
+# and from one process to another through the shared memory transport, measured on the receiving side.
+#
+# Usage:
+#   python bench_publish.py [number_of_messages]
+
+import multiprocessing
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+from lib.brokerwrapper import BrokerWrapper, Subscription
+from lib.transport import InProcessTransport
+from lib.shared_memory_transport import SharedMemoryTransport
+
+
+class LocalMqttBroker(object):
+    """
+    Just enough of an MQTT broker for benchmarking: CONNECT, SUBSCRIBE (exact topics), PUBLISH with QoS 0 and 1,
+    PINGREQ and DISCONNECT. Received messages are counted, and forwarded to the subscribers with QoS 0.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.server = socket.create_server((host, port))
+        self.port = self.server.getsockname()[1]
+        self.received = 0
+        self.received_lock = threading.Lock()
+        self.subscribers = {}  # topic -> list of client sockets
+        self.thread = threading.Thread(target=self.accept, daemon=True)
+        self.thread.start()
+
+    def accept(self):
+        while True:
+            connection, _ = self.server.accept()
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self.serve, args=(connection,), daemon=True).start()
+
+    def serve(self, connection):
+        try:
+            self.serve_packets(connection)
+        except OSError:
+            pass  # the client went away without a DISCONNECT.
+        finally:
+            for topic, subscribers in list(self.subscribers.items()):
+                self.subscribers[topic] = [entry for entry in subscribers if entry[0] is not connection]
+
+    def serve_packets(self, connection):
+        stream = connection.makefile('rb')
+        send_lock = threading.Lock()
+        while True:
+            first = stream.read(1)
+            if not first:
+                return
+            length, multiplier = 0, 1
+            while True:
+                byte = stream.read(1)[0]
+                length += (byte & 0x7f) * multiplier
+                multiplier *= 128
+                if not byte & 0x80:
+                    break
+            body = stream.read(length)
+            packet_type, flags = first[0] >> 4, first[0] & 0x0f
+            if packet_type == 1:  # CONNECT
+                with send_lock:
+                    connection.sendall(b'\x20\x02\x00\x00')
+            elif packet_type == 8:  # SUBSCRIBE
+                packet_id = body[:2]
+                topic_length = struct.unpack('>H', body[2:4])[0]
+                topic = body[4:4 + topic_length].decode('utf-8')
+                self.subscribers.setdefault(topic, []).append((connection, send_lock))
+                with send_lock:
+                    connection.sendall(b'\x90\x03' + packet_id + b'\x00')
+            elif packet_type == 3:  # PUBLISH
+                topic_length = struct.unpack('>H', body[:2])[0]
+                topic = body[2:2 + topic_length].decode('utf-8')
+                payload_start = 2 + topic_length
+                if (flags >> 1) & 0x03:
+                    packet_id = body[payload_start:payload_start + 2]
+                    payload_start += 2
+                    with send_lock:
+                        connection.sendall(b'\x40\x02' + packet_id)
+                with self.received_lock:
+                    self.received += 1
+                for subscriber, subscriber_lock in self.subscribers.get(topic, ()):
+                    forwarded = struct.pack('>H', topic_length) + body[2:2 + topic_length] + body[payload_start:]
+                    try:
+                        with subscriber_lock:
+                            subscriber.sendall(bytes([0x30]) + encode_length(len(forwarded)) + forwarded)
+                    except OSError:
+                        pass  # that subscriber is gone; not the publisher's problem.
+            elif packet_type == 12:  # PINGREQ
+                with send_lock:
+                    connection.sendall(b'\xd0\x00')
+            elif packet_type == 14:  # DISCONNECT
+                connection.close()
+                return
+
+
+def encode_length(length):
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(encoded)
+
+
+def run(broker, options, number_of_messages, batch_size):
+    wrapper = BrokerWrapper(broker_port=broker.port, **options)
+    time.sleep(0.2)  # let it connect
+    received_before = broker.received
+    messages = [f'{idx}' for idx in range(number_of_messages)]
+    start_time = time.perf_counter()
+    if batch_size:
+        for idx in range(0, number_of_messages, batch_size):
+            wrapper.publish_many('bench', messages[idx:idx + batch_size])
+    else:
+        for message in messages:
+            wrapper.publish('bench', message)
+    publish_done = time.perf_counter() - start_time
+    wrapper.flush()
+    while broker.received - received_before < number_of_messages:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start_time
+    wrapper.stop()
+    return number_of_messages / elapsed, publish_done, wrapper.publish_stats
+
+
+def run_receive(broker, log_messages, number_of_messages):
+    """round trip: publish on one wrapper, receive on another, with or without the per-message log line."""
+    received = threading.Semaphore(0)
+    receiver = BrokerWrapper(broker_port=broker.port, log_messages=log_messages)
+    receiver.subscribe(Subscription(topic='echo', subscriberName='bench', callback=lambda payload: received.release()))
+    sender = BrokerWrapper(broker_port=broker.port, pipelined=True)
+    time.sleep(0.2)
+    start_time = time.perf_counter()
+    sender.publish_many('echo', [b'x'] * number_of_messages)
+    for _ in range(number_of_messages):
+        received.acquire()
+    elapsed = time.perf_counter() - start_time
+    sender.stop()
+    receiver.stop()
+    return number_of_messages / elapsed
+
+
+def run_slow_subscriber(broker, dispatch_workers, number_of_messages):
+    fast_done = threading.Event()
+    fast_count = [0]
+
+    def on_fast(payload):
+        fast_count[0] += 1
+        if fast_count[0] == number_of_messages:
+            fast_done.set()
+
+    receiver = BrokerWrapper(broker_port=broker.port, log_messages=False, dispatch_workers=dispatch_workers)
+    receiver.subscribe(Subscription(topic='slow', subscriberName='slow', callback=lambda payload: time.sleep(0.005)))
+    receiver.subscribe(Subscription(topic='fast', subscriberName='fast', callback=on_fast))
+    sender = BrokerWrapper(broker_port=broker.port, pipelined=True)
+    time.sleep(0.2)
+    start_time = time.perf_counter()
+    for idx in range(number_of_messages):
+        sender.publish('fast', b'x')
+        if idx % 10 == 0:
+            sender.publish('slow', b'x')
+    fast_done.wait()
+    elapsed = time.perf_counter() - start_time
+    sender.stop()
+    receiver.stop()
+    return elapsed, receiver.dispatch_stats()
+
+
+def run_ping(sender, receiver, number_of_messages):
+    """mean latency from publish to callback, one message at a time, in seconds; the transports are stopped after."""
+    received = threading.Event()
+    receiver.subscribe(Subscription(topic='ping', subscriberName='bench', callback=lambda payload: received.set()))
+    time.sleep(0.2)
+    message = '{"timestamp": 0.0, "value": 1}'
+    start_time = time.perf_counter()
+    for _ in range(number_of_messages):
+        received.clear()
+        sender.publish('ping', message)
+        received.wait()
+    elapsed = time.perf_counter() - start_time
+    sender.stop()
+    if receiver is not sender:
+        receiver.stop()
+    return elapsed / number_of_messages
+
+
+def shared_memory_receiver(namespace, number_of_messages):
+    """
+    the other process: the latency of each 'ping', from the time stamp in it;
+    the mean, median and 99th percentile go back on 'result'.
+    """
+    transport = SharedMemoryTransport(namespace=namespace, log_messages=False)
+    latencies = []
+    transport.subscribe(Subscription(topic='ping', subscriberName='bench', callback=lambda payload: latencies.append(
+        time.perf_counter() - struct.unpack_from('<d', payload)[0])))
+    transport.publish('ready', b'')
+    while len(latencies) < number_of_messages:
+        time.sleep(0.01)
+    latencies.sort()
+    transport.publish('result', struct.pack('<3d', sum(latencies) / len(latencies), latencies[len(latencies) // 2],
+                                            latencies[int(len(latencies) * 0.99)]))
+    transport.stop()
+
+
+def run_shared_memory_ping(number_of_messages, interval=0.0002):
+    """(mean, median, 99th percentile) latency from publish in this process to callback in another one, in seconds."""
+    namespace = f'bench-{os.getpid()}'
+    transport = SharedMemoryTransport(namespace=namespace, log_messages=False, unlink_on_stop=True)
+    ready, result = threading.Event(), []
+    transport.subscribe(Subscription(topic='ready', subscriberName='bench', callback=lambda payload: ready.set()))
+    transport.subscribe(Subscription(topic='result', subscriberName='bench',
+                                     callback=lambda payload: result.append(struct.unpack('<3d', payload))))
+    # spawned rather than forked, this process having threads.
+    receiver = multiprocessing.get_context('spawn').Process(target=shared_memory_receiver,
+                                                            args=(namespace, number_of_messages))
+    receiver.start()
+    ready.wait()
+    for _ in range(number_of_messages):
+        transport.publish('ping', struct.pack('<d', time.perf_counter()))
+        time.sleep(interval)
+    receiver.join()
+    while not result:
+        time.sleep(0.001)
+    transport.stop()
+    return result[0]
+
+
+if __name__ == '__main__':
+    number_of_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    broker = LocalMqttBroker()
+    print(f'{number_of_messages:,} messages, local broker on port {broker.port}')
+    configurations = {
+        'direct, QoS 0': (dict(), 0),
+        'pipelined, QoS 0': (dict(pipelined=True), 0),
+        'pipelined, QoS 0, publish_many of 100': (dict(pipelined=True), 100),
+        'direct, QoS 1': (dict(qos=1), 0),
+        'pipelined, QoS 1, 100 in flight': (dict(pipelined=True, qos=1, max_inflight=100), 0),
+        'pipelined, QoS 1, 100 in flight, many': (dict(pipelined=True, qos=1, max_inflight=100), 100),
+    }
+    for label, (options, batch_size) in configurations.items():
+        rate, publish_done, stats = run(broker, options, number_of_messages, batch_size)
+        print(f'{label:40}: {rate:10,.0f} messages/sec; publish calls returned after {publish_done:.2f} s, '
+              f'max in flight {stats["max_in_flight"]}')
+
+    quiet = run_receive(broker, False, number_of_messages // 10)
+    print(f'{"receive, no per-message log":40}: {quiet:10,.0f} messages/sec')
+
+    number_of_fast = number_of_messages // 25
+    print(f'{number_of_fast:,} messages to a fast subscriber, and one in ten of that to a slow one:')
+    for dispatch_workers in (0, 4):
+        elapsed, stats = run_slow_subscriber(broker, dispatch_workers, number_of_fast)
+        label = f'callbacks on the {"dispatch pool" if dispatch_workers else "network thread"}'
+        print(f'{label:40}: fast subscriber got all after {elapsed:.2f} s')
+        for subscription in stats:
+            if subscription['delivered']:
+                print(f'  {subscription["subscriber"]:6}: max mailbox depth {subscription["max_depth"]:5}, '
+                      f'latency mean {subscription["latency_mean"] * 1e3:8.2f} ms, max {subscription["latency_max"] * 1e3:8.2f} ms')
+
+    number_of_pings = number_of_messages // 50
+    print(f'{number_of_pings:,} messages, one at a time, publish to callback:')
+    latency = run_ping(BrokerWrapper(broker_port=broker.port, log_messages=False),
+                       BrokerWrapper(broker_port=broker.port, log_messages=False), number_of_pings)
+    print(f'{"MQTT, local broker":40}: {latency * 1e6:10,.1f} us per message')
+    transport = InProcessTransport(log_messages=False)
+    latency = run_ping(transport, transport, number_of_pings)
+    print(f'{"in-process":40}: {latency * 1e6:10,.1f} us per message')
+    mean, median, p99 = run_shared_memory_ping(number_of_pings)
+    print(f'{"shared memory, another process":40}: {mean * 1e6:10,.1f} us per message; '
+          f'median {median * 1e6:.1f} us, 99th percentile {p99 * 1e6:.1f} us')
@@ -1,15 +1,25 @@
 from threading import Thread
 
-from lib.brokerwrapper import BrokerWrapper
+from lib.transport import make_transport, TRANSPORT_MQTT, TRANSPORT_SHARED_MEMORY
+from lib.codec import RECORD_CODEC
 from lib.agents.msgprint import MessagePrint
 from lib.agents.timetick import TimeTickAgent
+import sys
 import time
 
+# Usage:
+#   python demo_01.py [mqtt|in_process|shared_memory]
+# the agents are the same either way; only the transport handed to them changes.
+transport_kind = sys.argv[1] if len(sys.argv) > 1 else TRANSPORT_MQTT
 
-broker = BrokerWrapper()
+# the shared memory segments of the topics are removed when this, the only process, is done with them.
+options = {'unlink_on_stop': True} if transport_kind == TRANSPORT_SHARED_MEMORY else {}
+broker = make_transport(transport_kind, **options)
 ticker = TimeTickAgent(broker)
 printer = MessagePrint(broker)
 
 
 time.sleep(5)
-broker.publish('pleaseStop', "end of simulation.")
+broker.publish('pleaseStop', "end of simulation.", codec=RECORD_CODEC)
+time.sleep(0.5)  # let the stop message go round.
+broker.stop()
@@ -5,31 +5,27 @@ from abc import ABC, abstractmethod
 from typing import Callable, ClassVar
 from attr import dataclass, field
 
-from ..brokerwrapper import Subscription
-from ..brokerwrapper import BrokerWrapper
+from ..transport import Subscription, Transport
+from ..codec import RECORD_CODEC
 
 
 class MessagePrint:
-    def __init__(self, broker: BrokerWrapper = None, print_topics=['TimeTickAgent/tick', 'pleaseStop']):
+    def __init__(self, broker: Transport = None, print_topics=['TimeTickAgent/tick', 'pleaseStop'],
+                 codec=RECORD_CODEC):
         self.name = 'MessagePrintAgent'
 
-        if broker is None or not isinstance(broker, BrokerWrapper):
+        if broker is None or not isinstance(broker, Transport):
             raise ValueError("Broker is required")
 
         self.broker = broker
         self.print_topics = print_topics
         for topic in print_topics:
-            self.broker.subscribe(Subscription(subscriberName=f'self.name+{topic}', topic=topic, callback=self.on_message))
+            self.broker.subscribe(Subscription(subscriberName=f'self.name+{topic}', topic=topic, callback=self.on_message,
+                                               codec=codec))
 
     def on_message(self, message):
-        # the received message is bytes. decode:
-        message = message.decode('utf-8')
+        # decoded by the transport, with the codec of the subscription.
         print(f'{self.name} received {message}')
 
-    def on_stop(self, message):
-        print(f'TimeprintAgent stops due to : {message.decode("utf-8")}')
-        self.broker.unsubscribe('tick', self.on_message)
-        self.broker.unsubscribe('pleaseStop', self.on_message)
-
     def run(self):
         pass
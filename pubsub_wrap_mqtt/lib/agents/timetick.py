@@ -1,11 +1,12 @@
-from ..brokerwrapper import Subscription, BrokerWrapper
+from ..transport import Subscription, Transport
+from ..codec import DataRecord, RECORD_CODEC
 from threading import Thread
 import time
 
 
 class TimeTickAgent:
-    def __init__(self, broker: BrokerWrapper = None):
-        if broker is None or not isinstance(broker, BrokerWrapper):
+    def __init__(self, broker: Transport = None, codec=RECORD_CODEC):
+        if broker is None or not isinstance(broker, Transport):
             raise ValueError("Broker is required")
 
         self._pleaseStop = False
@@ -14,18 +15,20 @@ class TimeTickAgent:
 
         self.time = 0
         self.broker = broker
+        self.codec = codec
         self.thread = Thread(target=self.run)
         self.thread.start()
         # subscribe to "stop" topic
-        self.broker.subscribe(Subscription(subscriberName=self.name, topic='pleaseStop', callback=self.on_stop))
+        self.broker.subscribe(Subscription(subscriberName=self.name, topic='pleaseStop', callback=self.on_stop,
+                                           codec=codec))
 
     def run(self):
         while not self._pleaseStop:
-            self.broker.publish(self.outputTopic, self.time)
+            self.broker.publish(self.outputTopic, DataRecord(source=self.name, value=self.time), codec=self.codec)
             time.sleep(1.0)
             self.time += 1
 
     def on_stop(self, message):
-        print(f'TimeTickAgent stops due to : {message.decode("utf-8")}')
+        print(f'TimeTickAgent stops due to : {message}')
         self._pleaseStop = True
         self.thread.join()
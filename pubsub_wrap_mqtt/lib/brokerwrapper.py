@@ -2,35 +2,98 @@
 # abstraction of MQTT broker.
 # this broker class simplifies subscription to topics by allowing the classes to simply call "broker.subscribe(topic, callback)"
 # and the broker will call the callback when mqtt message of topic "topic" arrives.
+# it is the MQTT `Transport`; see transport.py for the interface, and for the in-process one.
 
 import paho.mqtt.client as mqttClient
 import paho.mqtt.enums
 import threading
 import time
-from queue import Queue
-from abc import ABC, abstractmethod
-from typing import Callable, ClassVar
-from attr import dataclass, field
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty, Full
 
+from .transport import Subscription, Transport
+from .codec import decoded_messages
 
-@dataclass
-class Subscription:
-    topic: str = field(default="unset")
-    subscriberName: str = field(default="unset")
-    callback: Callable = field(default=None)
 
+# pipelined publishing: what to do with a message when the outbound queue is full:
+OVERFLOW_BLOCK = 'block'  # block the publisher until there is room.
+OVERFLOW_DROP_NEWEST = 'drop_newest'  # discard the message, and count it in `publish_stats`.
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST)
 
-class BrokerWrapper:
-    def __init__(self, broker_ip="localhost", broker_port=1883):
+
+class BrokerWrapper(Transport):
+    """
+    By default, `publish` hands each message straight over to the MQTT client, on the thread of the caller.
+
+    With `pipelined=True`, `publish` and `publish_many` only put the messages into a bounded outbound queue;
+    a sender thread takes them out in batches of up to `batch_size`, and hands them over to the client.
+    With QoS 1, at most `max_inflight` messages are then awaiting their PUBACK at any time; the sender thread waits
+    for acknowledgements beyond that, instead of letting the client queue up an unbounded backlog.
+    `publish_stats` tells how the pipeline is doing, and `flush` waits until it is empty.
+
+    On the receiving side, the callbacks run on paho's network thread by default, so a slow one holds up
+    the keepalives and all the inbound traffic. With `dispatch_workers`, `on_message` only decodes the message,
+    and puts it into the mailbox of each matching subscription; the mailboxes are drained by a pool of that many
+    threads, one worker per mailbox at a time, so that each callback still sees its messages in order.
+    `dispatch_stats` tells the depth of the mailboxes, and how long the messages took from receipt to callback done.
+    """
+
+    def __init__(self, broker_ip="localhost", broker_port=1883, log_messages=True,
+                 pipelined=False, qos=0, max_queue_size=10000, overflow_policy=OVERFLOW_BLOCK,
+                 max_inflight=100, batch_size=100, dispatch_workers=0, dispatch_throughput=64, stop_timeout=10.0):
+        """
+        :param log_messages: print a line for every message received. Turn off for high message rates.
+        :param pipelined: publish through the outbound queue and the sender thread.
+        :param qos: MQTT quality of service of the published messages.
+        :param max_queue_size: bound on the number of entries in the outbound queue; a `publish_many` is a single entry.
+        :param overflow_policy: one of OVERFLOW_POLICIES, applied when the outbound queue is full.
+        :param max_inflight: QoS 1 and 2 only; max. number of messages published and not acknowledged yet.
+            Note that paho scans its in-flight messages on every acknowledgement, so much more than 100 gets slower.
+        :param batch_size: max. number of queue entries taken out by the sender thread at once.
+        :param dispatch_workers: size of the pool running the callbacks; 0 runs them on paho's network thread.
+        :param dispatch_throughput: max. messages delivered per mailbox visit, before the worker moves on to the next mailbox.
+        :param stop_timeout: pipelined only; how long `stop` waits for the queued messages to go out and be acknowledged.
+            Past that - say the connection died with the in-flight window full - the rest is dropped, and counted.
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy must be one of {OVERFLOW_POLICIES}, got {overflow_policy}")
         self.name = 'BrokerWrapper'
         self.topics: dict[str, list[Subscription]] = {}
+        self.log_messages = log_messages
+        self.pipelined = pipelined
+        self.qos = qos
+        self.overflow_policy = overflow_policy
+        self.max_inflight = max_inflight
+        self.batch_size = batch_size
+        self.publish_stats = {'queued': 0, 'dropped': 0, 'published': 0, 'acknowledged': 0, 'batches': 0,
+                              'in_flight': 0, 'max_in_flight': 0}
+        self.stats_lock = threading.Lock()
+        self.in_flight_condition = threading.Condition()
+        self.outbound_queue = Queue(maxsize=max_queue_size)
+        self.dispatch_throughput = dispatch_throughput
+        self.stop_timeout = stop_timeout
+        self.stopping = False  # set by `stop` once done waiting: the sender thread no longer waits for acknowledgements.
+        self.dispatcher = None
+        if dispatch_workers:
+            self.dispatcher = ThreadPoolExecutor(max_workers=dispatch_workers, thread_name_prefix=f'{self.name}-dispatch')
+        # number of messages in the mailboxes or being delivered, for `wait_dispatched`.
+        self.pending_deliveries = 0
+        self.dispatch_idle = threading.Condition()
 
         self.client = mqttClient.Client(callback_api_version=paho.mqtt.enums.CallbackAPIVersion.VERSION2)
         self.client.on_message = self.on_message
         self.client.on_connect = self.on_connect
+        if pipelined and qos > 0:
+            self.client.on_publish = self.on_publish
+            self.client.max_inflight_messages_set(max_inflight)
         self.client.connect(broker_ip, broker_port)
         self.thread = threading.Thread(target=self.forever)
         self.thread.start()
+        self.sender_thread = None
+        if pipelined:
+            self.sender_thread = threading.Thread(target=self.run_sender, name=f'{self.name}-sender')
+            self.sender_thread.start()
 
     def on_connect(self, client, userdata, flags, reason_code, properties):
         print("Connected with result code " + str(reason_code))
@@ -69,27 +132,224 @@ class BrokerWrapper:
         :param userdata:
         :return: None. this is a callback from the mqtt library.
         """
-        print(f"Received a message on topic {message.topic}")
+        if self.log_messages:
+            print(f"Received a message on topic {message.topic}")
 
         subscriptions = self.topics.get(message.topic, [])
 
-        if subscriptions:
-            for subscription in subscriptions:
-                subscription.callback(message.payload)
-        else:
+        if subscriptions and self.dispatcher is not None:
+            self.dispatch(subscriptions, message.payload)
+        elif subscriptions:
+            for subscription, decoded in decoded_messages(subscriptions, message.payload):
+                subscription.callback(decoded)
+        elif self.log_messages:
             print(f"Warning: No subscriptions found for topic {message.topic}")
         return None
 
-    def publish(self, topic, message):
+    def dispatch(self, subscriptions, payload):
+        """
+        called on the network thread: decodes the payload, once per codec, hands the messages over to the mailboxes,
+        and gets the idle ones drained.
+        """
+        received = time.monotonic()
+        deliveries = list(decoded_messages(subscriptions, payload))
+        with self.dispatch_idle:
+            self.pending_deliveries += len(deliveries)
+        for subscription, message in deliveries:
+            if subscription.mailbox.put((received, message)):
+                self.dispatcher.submit(self.drain_mailbox, subscription)
+
+    def drain_mailbox(self, subscription):
+        """
+        runs on the pool: delivers at most `dispatch_throughput` messages of the mailbox,
+        then either goes idle, or submits itself again, so that the other mailboxes get their turn.
+        """
+        stats = subscription.stats
+
+        def deliver(entry):
+            received, message = entry
+            try:
+                subscription.callback(message)
+            except Exception:
+                traceback.print_exc()
+            latency = time.monotonic() - received
+            stats['delivered'] += 1
+            stats['latency_total'] += latency
+            if latency > stats['latency_max']:
+                stats['latency_max'] = latency
+
+        delivered, more = subscription.mailbox.drain(deliver, self.dispatch_throughput)
+        if more:
+            self.dispatcher.submit(self.drain_mailbox, subscription)
+        with self.dispatch_idle:
+            self.pending_deliveries -= delivered
+            if not self.pending_deliveries:
+                self.dispatch_idle.notify_all()
+
+    def dispatch_stats(self):
+        """per subscription: mailbox depth now and at most, messages delivered, and their latency from receipt, in seconds."""
+        report = []
+        for subscriptions in list(self.topics.values()):
+            for subscription in subscriptions:
+                stats = subscription.stats
+                delivered = stats['delivered']
+                report.append({'topic': subscription.topic, 'subscriber': subscription.subscriberName,
+                               'depth': len(subscription.mailbox), 'max_depth': subscription.mailbox.max_depth,
+                               'delivered': delivered,
+                               'latency_mean': stats['latency_total'] / delivered if delivered else None,
+                               'latency_max': stats['latency_max'] if delivered else None})
+        return report
+
+    def wait_dispatched(self, timeout=None):
+        """waits until every message received so far has been through its callbacks; returns False on timeout."""
+        with self.dispatch_idle:
+            return self.dispatch_idle.wait_for(lambda: not self.pending_deliveries, timeout)
+
+    def publish(self, topic, message, codec=None):
         """
-        simply forward the message to the mqtt broker.
+        simply forward the message to the mqtt broker; or, pipelined, queue it for the sender thread.
         :param topic: topic to publish on
         :param message: the message to publish
+        :param codec: encodes the message, on the caller's thread; None publishes it as it is.
         :return: None
         """
-        self.client.publish(topic, message)
+        if codec is not None:
+            message = codec.encode(message)
+        if not self.pipelined:
+            self.client.publish(topic, message, qos=self.qos)
+            return None
+        self.enqueue((topic, (message,)))
         return None
 
+    def publish_many(self, topic, messages, codec=None):
+        """
+        publishes a sequence of messages to one topic; pipelined, they take a single entry of the outbound queue.
+        :return: None
+        """
+        messages = tuple(messages) if codec is None else tuple(codec.encode(message) for message in messages)
+        if not messages:
+            return None
+        if not self.pipelined:
+            for message in messages:
+                self.client.publish(topic, message, qos=self.qos)
+            return None
+        self.enqueue((topic, messages))
+        return None
+
+    def enqueue(self, entry):
+        try:
+            if self.overflow_policy == OVERFLOW_BLOCK:
+                self.outbound_queue.put(entry)
+            else:
+                self.outbound_queue.put_nowait(entry)
+        except Full:
+            with self.stats_lock:
+                self.publish_stats['dropped'] += len(entry[1])
+            return
+        with self.stats_lock:
+            self.publish_stats['queued'] += len(entry[1])
+
+    def run_sender(self):
+        """the sender thread: takes the entries out of the outbound queue in batches, and publishes them."""
+        while True:
+            batch = [self.outbound_queue.get()]  # blocks until there is something to send.
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.outbound_queue.get_nowait())
+                except Empty:
+                    break
+            published = 0
+            dropped = 0
+            stop = False
+            for entry in batch:
+                if entry is None:  # shutdown signal, after everything queued before it.
+                    stop = True
+                    continue
+                topic, messages = entry
+                if self.qos == 0:
+                    for message in messages:
+                        self.client.publish(topic, message, qos=0)
+                    published += len(messages)
+                    continue
+                sent = 0
+                while sent < len(messages):
+                    # as many slots as are free at once, rather than waiting for them one by one.
+                    granted = self.reserve_in_flight(len(messages) - sent)
+                    if not granted:  # stopping, with no acknowledgement coming: the rest is dropped.
+                        dropped += len(messages) - sent
+                        break
+                    for message in messages[sent:sent + granted]:
+                        self.client.publish(topic, message, qos=self.qos)
+                    sent += granted
+                published += sent
+            with self.stats_lock:
+                self.publish_stats['published'] += published
+                self.publish_stats['dropped'] += dropped
+                self.publish_stats['batches'] += 1
+            for _ in batch:
+                self.outbound_queue.task_done()
+            if stop:
+                return
+
+    def reserve_in_flight(self, wanted):
+        """
+        waits until at least one more message may be in flight; returns how many of the `wanted` may go now.
+        Once stopping, does not wait any more: 0 if the window is still full.
+        """
+        stats = self.publish_stats
+        with self.in_flight_condition:
+            while stats['in_flight'] >= self.max_inflight:
+                if self.stopping:
+                    return 0
+                self.in_flight_condition.wait()
+            granted = min(wanted, self.max_inflight - stats['in_flight'])
+            stats['in_flight'] += granted
+            stats['max_in_flight'] = max(stats['max_in_flight'], stats['in_flight'])
+        return granted
+
+    def on_publish(self, client, userdata, mid, reason_code, properties):
+        """pipelined QoS 1 and 2 only: an acknowledgement came in, which makes room for one more message in flight."""
+        with self.in_flight_condition:
+            self.publish_stats['in_flight'] -= 1
+            self.publish_stats['acknowledged'] += 1
+            # both the sender thread, for room, and `flush`, for none in flight, may be waiting.
+            self.in_flight_condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        pipelined only: waits until the outbound queue is empty and, with QoS 1 and 2, every message is acknowledged.
+        :return: False if the timeout expired first.
+        """
+        if not self.pipelined:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.outbound_queue.all_tasks_done:
+            if not self.outbound_queue.all_tasks_done.wait_for(lambda: not self.outbound_queue.unfinished_tasks, timeout):
+                return False
+        with self.in_flight_condition:
+            return self.in_flight_condition.wait_for(
+                lambda: self.publish_stats['in_flight'] == 0,
+                None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def stop(self):
+        """
+        sends whatever is still queued, then disconnects from the MQTT broker, and lets the callbacks catch up.
+        Pipelined, waits at most `stop_timeout` for the messages to go out and be acknowledged; drops the rest.
+        """
+        if self.sender_thread is not None:
+            if not self.flush(self.stop_timeout):
+                print(f"Warning: {self.name} stopping with messages still unsent or unacknowledged, after {self.stop_timeout} s")
+            with self.in_flight_condition:
+                self.stopping = True
+                self.in_flight_condition.notify_all()
+            self.outbound_queue.put(None)  # the sender thread, no longer held up, makes room for it.
+            self.sender_thread.join()
+        self.client.disconnect()
+        self.client.loop_stop()
+        if self.dispatcher is not None:
+            self.wait_dispatched()
+            self.dispatcher.shutdown(wait=True)
+
 
 
 
@@ -0,0 +1,129 @@
+# concept:
+# the payloads on the wire are bytes; the agents would rather deal with objects.
+# a codec turns one into the other: the publisher passes it to `publish`, the subscriber puts it in its `Subscription`.
+# the transport then decodes each message once per codec, and hands the same object to all the subscribers using that codec.
+
+import json
+import struct
+import time
+from abc import ABC, abstractmethod
+from attr import dataclass, field, has, asdict
+
+
+@dataclass(slots=True, frozen=True)
+class DataRecord:
+    """
+    Same fields as `SomeData`. Frozen, since one decoded instance goes to all the subscribers of a topic.
+    """
+    timestamp: float = field(factory=time.time)
+    source: str = field(default="unset")
+    value: int = field(default=0)
+
+
+class Codec(ABC):
+
+    @abstractmethod
+    def encode(self, message):
+        """the payload for the message, as bytes."""
+
+    @abstractmethod
+    def decode(self, payload):
+        """the message back from the payload: bytes, or a memoryview of them."""
+
+
+def json_default(obj):
+    """attrs instances, such as the records, go as dicts of their fields."""
+    if has(type(obj)):
+        return asdict(obj, recurse=False)
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+class JsonCodec(Codec):
+    """any JSON-serializable message, plus attrs instances as dicts; compact, utf-8."""
+
+    def encode(self, message):
+        return json.dumps(message, separators=(',', ':'), default=json_default).encode('utf-8')
+
+    def decode(self, payload):
+        return json.loads(bytes(payload) if isinstance(payload, memoryview) else payload)
+
+
+# binary record layout, little-endian: tag, timestamp, value, size of the source; then the source, utf-8.
+# the tags are bytes no JSON text starts with, so that the other messages can go as JSON in the same topic.
+INT_RECORD = struct.Struct('<BdqH')
+FLOAT_RECORD = struct.Struct('<BddH')
+INT_TAG, FLOAT_TAG = 1, 2
+RECORDS = {INT_TAG: INT_RECORD, FLOAT_TAG: FLOAT_RECORD}
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+MAX_SOURCE_SIZE = 2 ** 16 - 1
+
+
+class RecordCodec(JsonCodec):
+    """
+    `SomeData`-shaped records - anything with a timestamp, a source and an int or float value - in 19 bytes
+    plus the source. Decoding unpacks the fields straight from the payload, and gives `record_type` instances.
+
+    Any other message goes as JSON; so do the records which do not fit, say with an int value beyond int64:
+    those come back as dicts. A payload that is neither - plain text from some other MQTT client - comes back as the text.
+    """
+
+    def __init__(self, record_type=DataRecord):
+        self.record_type = record_type
+
+    def encode(self, message):
+        value = getattr(message, 'value', None)
+        value_type = type(value)
+        if value_type is int or value_type is float:
+            timestamp = getattr(message, 'timestamp', None)
+            source = getattr(message, 'source', None)
+            if type(timestamp) in (int, float) and type(source) is str:
+                source = source.encode('utf-8')
+                if len(source) <= MAX_SOURCE_SIZE:
+                    if value_type is float:
+                        return FLOAT_RECORD.pack(FLOAT_TAG, timestamp, value, len(source)) + source
+                    if INT64_MIN <= value <= INT64_MAX:
+                        return INT_RECORD.pack(INT_TAG, timestamp, value, len(source)) + source
+        return super().encode(message)
+
+    def decode(self, payload):
+        layout = RECORDS.get(payload[0]) if len(payload) else None
+        if layout is None:
+            try:
+                return super().decode(payload)
+            except ValueError:
+                return bytes(payload).decode('utf-8', errors='replace')
+        _, timestamp, value, source_size = layout.unpack_from(payload)
+        source = str(payload[layout.size:layout.size + source_size], 'utf-8')
+        return self.record_type(timestamp=timestamp, source=source, value=value)
+
+
+JSON_CODEC = JsonCodec()
+RECORD_CODEC = RecordCodec()
+
+FAILED = object()  # marks a payload a codec could not decode.
+
+
+def decoded_messages(subscriptions, payload):
+    """
+    (subscription, message) for each of the subscriptions: the payload decoded by the codec of the subscription
+    - once per codec, the subscriptions using the same one sharing the result. Without a codec, the payload as it is.
+    A payload that a codec fails to decode is reported, and skipped by the subscriptions using that codec.
+    """
+    decoded = {}
+    for subscription in subscriptions:
+        codec = subscription.codec
+        if codec is None:
+            yield subscription, payload
+            continue
+        if codec in decoded:
+            message = decoded[codec]
+        else:
+            try:
+                message = codec.decode(payload)
+            except Exception as error:
+                print(f"Warning: {type(codec).__name__} could not decode a message for {subscription.subscriberName}: "
+                      f"{error!r}")
+                message = FAILED
+            decoded[codec] = message
+        if message is not FAILED:
+            yield subscription, message
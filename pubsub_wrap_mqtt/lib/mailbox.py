@@ -0,0 +1,52 @@
+# concept:
+# a consumer that must see its messages in order, served by a pool of threads shared with other consumers.
+# the messages go into its mailbox; a drain of the mailbox is submitted to the pool only when none is under way already,
+# so that one worker at a time delivers them. A drain delivers a bounded number of them, then submits itself again,
+# so that a busy consumer does not keep the worker from the other mailboxes.
+
+import threading
+from collections import deque
+
+
+class Mailbox(object):
+    """
+    The messages waiting for one consumer, and whether a drain of them is under way.
+    `put` tells when a drain must be submitted; `drain` tells when another one must be, to go on where it stopped.
+    """
+    __slots__ = ('messages', 'lock', 'scheduled', 'max_depth')
+
+    def __init__(self):
+        self.messages = deque()
+        self.lock = threading.Lock()
+        self.scheduled = False
+        self.max_depth = 0
+
+    def __len__(self):
+        return len(self.messages)
+
+    def put(self, message):
+        """adds the message; True if the mailbox was idle, in which case the caller must submit a drain."""
+        with self.lock:
+            self.messages.append(message)
+            if len(self.messages) > self.max_depth:
+                self.max_depth = len(self.messages)
+            if self.scheduled:
+                return False
+            self.scheduled = True
+            return True
+
+    def drain(self, deliver, throughput):
+        """
+        calls `deliver` with the messages, in order, at most `throughput` times.
+        :return: how many were delivered, and whether some may be left - in which case the caller must submit another drain.
+        """
+        delivered = 0
+        while delivered < throughput:
+            with self.lock:
+                if not self.messages:
+                    self.scheduled = False
+                    return delivered, False
+                message = self.messages.popleft()
+            deliver(message)
+            delivered += 1
+        return delivered, True
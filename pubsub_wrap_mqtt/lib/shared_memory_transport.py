@@ -0,0 +1,329 @@
+# concept:
+# a `Transport` for agents in separate processes on one host, without any broker process:
+# each topic is a ring buffer in a `multiprocessing.shared_memory` segment, named after the topic.
+# one process publishes on a topic, any number of processes read it, each at its own pace.
+
+import hashlib
+import os
+import struct
+import sys
+import threading
+import time
+import traceback
+from multiprocessing import shared_memory, resource_tracker
+
+from .transport import Subscription, Transport
+from .codec import decoded_messages
+
+# segment layout, little-endian:
+#   header: magic, capacity of the ring in bytes, write position, number of messages written; padded to DATA_OFFSET.
+#   ring:   records, each a record header then the payload, zero-padded to a multiple of 8 bytes.
+#           a record never wraps around the end of the ring: a WRAP length in its place means "continue at the start".
+# the write position counts all the bytes ever written, so that `position % capacity` is the offset in the ring,
+# and a reader knows it has been lapped when the writer is more than a ring ahead of it.
+MAGIC = b'PSRING01'
+HEADER = struct.Struct('<8sQQQ')  # magic, capacity, write position, message count
+WRITE_POSITION = struct.Struct('<Q')
+WRITE_POSITION_OFFSET = 16
+MESSAGE_COUNT_OFFSET = 24
+DATA_OFFSET = 64
+RECORD_HEADER = struct.Struct('<II')  # payload size, sequence number (modulo 2**32)
+WRAP = 0xFFFFFFFF
+
+# since Python 3.13, a segment can be kept away from the resource tracker, which would unlink it when this process exits,
+# under the feet of the other processes. Before that, it is unregistered after the fact, see `attach`.
+UNTRACKED = {'track': False} if sys.version_info >= (3, 13) else {}
+
+# for the spinning reader: gives up the CPU and the GIL for a moment. Not time.sleep(0) where there is a choice:
+# on Linux, that is a nanosleep, which takes the timer slack - some 50 us.
+yield_cpu = getattr(os, 'sched_yield', None) or (lambda: time.sleep(0))
+
+
+def padding(size):
+    return -size % 8
+
+
+def segment_name(namespace, topic):
+    """topics may be long and hold any character; segment names may not, so the name is a hash of the topic."""
+    return f'{namespace}-{hashlib.blake2b(topic.encode("utf-8"), digest_size=8).hexdigest()}'
+
+
+def encode_payload(message):
+    """the bytes of the message, accepting what paho accepts."""
+    if isinstance(message, (bytes, bytearray, memoryview)):
+        return message
+    if isinstance(message, str):
+        return message.encode('utf-8')
+    if message is None:
+        return b''
+    if isinstance(message, (int, float)):
+        return str(message).encode('ascii')
+    raise TypeError('payload must be a string, bytes-like, int, float or None.')
+
+
+class TopicRing(object):
+    """the segment of one topic, as mapped in this process; either side may be the first to create it."""
+
+    def __init__(self, namespace, topic, capacity):
+        self.topic = topic
+        self.name = segment_name(namespace, topic)
+        self.segment, self.created = self.attach(self.name, DATA_OFFSET + capacity)
+        self.buffer = self.segment.buf
+        if self.created:
+            HEADER.pack_into(self.buffer, 0, b'\0' * 8, capacity, 0, 0)
+            self.buffer[0:8] = MAGIC  # last, so that nobody uses the segment half set up.
+        else:
+            deadline = time.monotonic() + 1.0
+            while bytes(self.buffer[0:8]) != MAGIC:
+                if time.monotonic() > deadline:
+                    self.release()
+                    raise ValueError(f"shared memory segment {self.name} of topic {topic} is not a topic ring")
+                time.sleep(0.001)
+        _, self.capacity, _, _ = HEADER.unpack_from(self.buffer, 0)
+        self.ring = self.buffer[DATA_OFFSET:DATA_OFFSET + self.capacity]
+        # while writing a record, the writer may get up to two records (one skipped at the end of the ring, one written)
+        # ahead of its published position; with records up to a quarter of the ring, a reader at most half a ring
+        # behind is sure its next record is not being overwritten. Further behind, it skips ahead instead.
+        self.max_lag = self.capacity // 2
+        # a reader further behind than this copies the payloads out of the ring, rather than handing over views of it.
+        self.copy_lag = self.capacity // 4
+        self.max_payload = self.capacity // 4 - RECORD_HEADER.size - 8
+
+    @staticmethod
+    def attach(name, size):
+        try:
+            segment = shared_memory.SharedMemory(name=name, create=True, size=size, **UNTRACKED)
+            created = True
+        except FileExistsError:
+            segment = shared_memory.SharedMemory(name=name, **UNTRACKED)
+            created = False
+        if not UNTRACKED:
+            resource_tracker.unregister(segment._name, 'shared_memory')
+        return segment, created
+
+    def write_position(self):
+        return WRITE_POSITION.unpack_from(self.buffer, WRITE_POSITION_OFFSET)[0]
+
+    def write(self, payload):
+        """appends one record; single producer - the caller holds the lock of the topic."""
+        size = len(payload)
+        if size > self.max_payload:
+            raise ValueError(f"message of {size} bytes is too large for the ring of topic {self.topic}, "
+                             f"max. {self.max_payload} bytes")
+        ring, capacity = self.ring, self.capacity
+        _, _, position, count = HEADER.unpack_from(self.buffer, 0)
+        offset = position % capacity
+        record_size = RECORD_HEADER.size + size + padding(size)
+        if offset + record_size > capacity:
+            RECORD_HEADER.pack_into(ring, offset, WRAP, 0)
+            position += capacity - offset
+            offset = 0
+        RECORD_HEADER.pack_into(ring, offset, size, count & WRAP)
+        ring[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + size] = payload
+        # the count, then the position: once a reader sees the new position, the record is complete.
+        WRITE_POSITION.pack_into(self.buffer, MESSAGE_COUNT_OFFSET, count + 1)
+        WRITE_POSITION.pack_into(self.buffer, WRITE_POSITION_OFFSET, position + record_size)
+
+    def release(self, unlink=False):
+        self.ring = self.buffer = None
+        try:
+            self.segment.close()
+        except BufferError:
+            pass  # a callback kept a view of a payload; the mapping goes when that view does.
+        if unlink:
+            if not UNTRACKED:
+                resource_tracker.register(self.segment._name, 'shared_memory')  # unlink() unregisters it again.
+            try:
+                self.segment.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class TopicReader(object):
+    """where this process is in the ring of a topic, and the subscriptions of the topic."""
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.subscriptions = ()
+        # only the messages published from now on, as with MQTT.
+        _, _, self.position, count = HEADER.unpack_from(ring.buffer, 0)
+        self.last_sequence = (count - 1) & WRAP
+        self.stats = {'received': 0, 'dropped': 0, 'overruns': 0, 'overwritten': 0}
+
+    def poll(self, log_messages=False):
+        """delivers the records written since the last poll; returns the number delivered."""
+        ring = self.ring
+        if ring.buffer is None:
+            return 0  # released by `stop`, from a callback of this very thread.
+        ring_buffer, capacity, max_lag = ring.ring, ring.capacity, ring.max_lag
+        write_position = ring.write_position()
+        delivered = 0
+        while self.position < write_position:
+            if write_position - self.position > max_lag:
+                self.skip_ahead()
+                break
+            offset = self.position % capacity
+            size, sequence = RECORD_HEADER.unpack_from(ring_buffer, offset)
+            if size == WRAP:
+                self.position += capacity - offset
+                continue
+            start = offset + RECORD_HEADER.size
+            payload = ring_buffer[start:start + size]  # a view of the segment: no copy.
+            if ring.write_position() - self.position > max_lag:  # overwritten while reading its header.
+                payload.release()
+                self.skip_ahead()
+                break
+            if ring.write_position() - self.position > ring.copy_lag:
+                # the writer is closing in: better copy the payload now, than have it overwritten under the callbacks.
+                view, payload = payload, bytes(payload)
+                view.release()
+            # decoded here, once per codec - from the ring, which the writer may overwrite meanwhile. So, seqlock style,
+            # the record must still be intact once decoded; if not, it is dropped, as if it had been skipped.
+            deliveries = list(decoded_messages(self.subscriptions, payload))
+            if ring.write_position() - self.position > max_lag:
+                if isinstance(payload, memoryview):
+                    payload.release()
+                self.skip_ahead()
+                break
+            self.stats['dropped'] += (sequence - self.last_sequence - 1) & WRAP
+            self.last_sequence = sequence
+            record_position = self.position
+            self.position = start + size + padding(size) + (self.position - offset)
+            self.stats['received'] += 1
+            delivered += 1
+            if log_messages:
+                print(f"Received a message on topic {ring.topic}")
+            for subscription, message in deliveries:
+                try:
+                    subscription.callback(message)
+                except Exception:
+                    traceback.print_exc()
+            if ring.buffer is None:
+                return delivered  # a callback stopped the transport.
+            viewed = isinstance(payload, memoryview) and any(message is payload for _, message in deliveries)
+            if viewed and ring.write_position() - record_position > max_lag:
+                # a callback was handed the view itself, and took long enough for the writer to lap it meanwhile.
+                self.stats['overwritten'] += 1
+        return delivered
+
+    def skip_ahead(self):
+        """lapped by the writer: carry on from its current position; the messages in between are lost."""
+        self.stats['overruns'] += 1
+        self.position = self.ring.write_position()
+
+
+class SharedMemoryTransport(Transport):
+    """
+    For agents in separate processes on one host: each topic is a ring buffer in shared memory,
+    single producer / multiple consumers. No broker process, no socket, no serialization beyond the payload bytes.
+
+    `publish` copies the payload into the ring of the topic, and returns. A reader thread polls the rings of the topics
+    subscribed to, and calls the callbacks with a `memoryview` of the payload in the ring - no copy. The view is only
+    valid during the callback, and holds up closing the segment: `bytes(payload)` to keep it.
+    With a codec in the subscription, the callback gets the message decoded, straight from that view.
+    The reader thread spins for `spin_polls` empty polls, which keeps the latency in the microseconds while messages
+    flow, then sleeps `poll_interval` between polls, so that an idle subscriber does not burn a core.
+
+    Only one process may publish on a topic; within it, publishing is thread-safe. A reader that falls more than
+    half a ring behind skips the messages it missed, and carries on with the next one published - which tells how many
+    were lost; see `ring_stats`. Size `capacity` for the bursts of the topic.
+    A message overwritten while being decoded is dropped the same way. A reader more than a quarter of a ring behind
+    hands over copies of the payloads instead of views; still, a callback keeping its view for as long as the writer
+    takes to lap it sees it overwritten - counted as `overwritten`.
+    A segment lives until a transport created with `unlink_on_stop` stops: give that to the process outliving the others.
+    """
+
+    def __init__(self, namespace='pubsub', capacity=1 << 20, log_messages=True,
+                 spin_polls=10000, poll_interval=0.001, unlink_on_stop=False):
+        """
+        :param namespace: prefix of the segment names; transports only see each other within the same namespace.
+        :param capacity: size in bytes of the ring of a topic created by this transport; a multiple of 8.
+            A message may take up to a quarter of it.
+        :param log_messages: print a line for every message received, like `BrokerWrapper`.
+        :param spin_polls: number of empty polls in a row, yielding the CPU in between, before the reader thread sleeps.
+        :param poll_interval: sleep of the idle reader thread between polls, in seconds.
+        :param unlink_on_stop: remove the segments of all the topics used here, on `stop`.
+        """
+        if capacity <= 0 or capacity % 8:
+            raise ValueError(f"capacity must be a positive multiple of 8, got {capacity}")
+        self.name = 'SharedMemoryTransport'
+        self.namespace = namespace
+        self.capacity = capacity
+        self.log_messages = log_messages
+        self.spin_polls = spin_polls
+        self.poll_interval = poll_interval
+        self.unlink_on_stop = unlink_on_stop
+        self.rings: dict[str, TopicRing] = {}
+        self.readers: dict[str, TopicReader] = {}  # replaced, never mutated, so that the reader thread needs no lock.
+        self.publish_locks: dict[str, threading.Lock] = {}
+        self.lock = threading.Lock()
+        self.running = True
+        self.thread = threading.Thread(target=self.run_reader, name=f'{self.name}-reader', daemon=True)
+        self.thread.start()
+
+    def ring_of(self, topic):
+        ring = self.rings.get(topic)
+        if ring is None:
+            with self.lock:
+                ring = self.rings.get(topic)
+                if ring is None:
+                    ring = self.rings[topic] = TopicRing(self.namespace, topic, self.capacity)
+                    self.publish_locks[topic] = threading.Lock()
+        return ring
+
+    def subscribe(self, subscription=None):
+        if subscription is None or not isinstance(subscription, Subscription):
+            raise ValueError("Subscription must be a Subscription object")
+        ring = self.ring_of(subscription.topic)
+        with self.lock:
+            readers = dict(self.readers)
+            reader = readers.get(subscription.topic)
+            if reader is None:
+                reader = readers[subscription.topic] = TopicReader(ring)
+            reader.subscriptions = reader.subscriptions + (subscription,)
+            self.readers = readers
+        return None
+
+    def publish(self, topic, message, codec=None):
+        ring = self.ring_of(topic)
+        payload = encode_payload(message) if codec is None else codec.encode(message)
+        with self.publish_locks[topic]:
+            ring.write(payload)
+        return None
+
+    def publish_many(self, topic, messages, codec=None):
+        ring = self.ring_of(topic)
+        payloads = [encode_payload(message) if codec is None else codec.encode(message) for message in messages]
+        with self.publish_locks[topic]:
+            for payload in payloads:
+                ring.write(payload)
+
+    def run_reader(self):
+        idle_polls = 0
+        while self.running:
+            delivered = 0
+            for reader in self.readers.values():
+                delivered += reader.poll(self.log_messages)
+            if delivered:
+                idle_polls = 0
+            elif idle_polls < self.spin_polls:
+                idle_polls += 1
+                yield_cpu()  # lets the other threads, and processes, run.
+            else:
+                time.sleep(self.poll_interval)
+
+    def ring_stats(self):
+        """per topic subscribed to: messages received, lost, and the times this process was lapped by the writer."""
+        return [{'topic': topic, **reader.stats, 'lag': reader.ring.write_position() - reader.position}
+                for topic, reader in self.readers.items()]
+
+    def stop(self):
+        """stops the reader thread, and releases the segments - and removes them, with `unlink_on_stop`."""
+        self.running = False
+        if self.thread is not threading.current_thread():
+            self.thread.join()
+        with self.lock:
+            self.readers = {}
+            for ring in self.rings.values():
+                ring.release(unlink=self.unlink_on_stop)
+            self.rings = {}
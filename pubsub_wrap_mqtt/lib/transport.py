@@ -0,0 +1,140 @@
+# concept:
+# what the agents need from a broker: subscribe(Subscription), and publish(topic, message).
+# `BrokerWrapper` does it over MQTT; `InProcessTransport` does it within the process, handing over the messages themselves;
+# `SharedMemoryTransport` does it between the processes of one host, through ring buffers in shared memory.
+# the agents only know about `Transport`, so which one they get is a matter of configuration, see `make_transport`.
+
+import threading
+import traceback
+from abc import ABC, abstractmethod
+from typing import Callable
+from attr import dataclass, field
+from .mailbox import Mailbox
+from .codec import decoded_messages
+
+
+TRANSPORT_MQTT = 'mqtt'
+TRANSPORT_IN_PROCESS = 'in_process'
+TRANSPORT_SHARED_MEMORY = 'shared_memory'
+TRANSPORTS = (TRANSPORT_MQTT, TRANSPORT_IN_PROCESS, TRANSPORT_SHARED_MEMORY)
+
+
+@dataclass
+class Subscription:
+    topic: str = field(default="unset")
+    subscriberName: str = field(default="unset")
+    callback: Callable = field(default=None)
+    # decodes the payloads for the callback, see codec.py; None hands over the payloads as they are.
+    # with `RecordCodec`, expect dicts for the records which do not fit its layout, and text for what is not JSON.
+    codec: object = field(default=None)
+    # dispatch on the pool only: the (receive time, message) waiting for the callback, and the counters behind `dispatch_stats`.
+    mailbox: Mailbox = field(factory=Mailbox, eq=False, repr=False)
+    stats: dict = field(factory=lambda: {'delivered': 0, 'latency_total': 0.0, 'latency_max': 0.0}, eq=False, repr=False)
+
+
+def payload_text(message):
+    """
+    the message as text: MQTT hands over bytes, shared memory a memoryview of them,
+    the in-process transport whatever was published.
+    """
+    if isinstance(message, (bytes, bytearray, memoryview)):
+        return bytes(message).decode('utf-8')
+    return str(message)
+
+
+class Transport(ABC):
+    """
+    the broker, as seen by the agents.
+    A callback gets the message as published - or, between processes, its bytes; use `payload_text` to read it either way.
+    Or, with a codec on both sides - passed to `publish`, and set in the `Subscription` - the callback gets the message
+    decoded, decoded only once for all the subscribers using the same codec.
+    What the callback gets is up to the codec of its subscription, whatever the transport: with `RecordCodec`, a record
+    type instance - or a dict, for a record whose value does not fit the binary layout, or whatever else was published
+    as JSON; see codec.py.
+    """
+
+    @abstractmethod
+    def subscribe(self, subscription=None):
+        """registers the subscription; its callback gets every message published on its topic from now on."""
+
+    @abstractmethod
+    def publish(self, topic, message, codec=None):
+        """delivers the message to the subscribers of the topic; encoded by the codec, if given."""
+
+    def publish_many(self, topic, messages, codec=None):
+        for message in messages:
+            self.publish(topic, message, codec)
+
+    def flush(self, timeout=None):
+        """waits until everything published so far is on its way; False if the timeout expired first."""
+        return True
+
+    def stop(self):
+        """releases the connection, threads, etc. of the transport."""
+        pass
+
+
+class InProcessTransport(Transport):
+    """
+    For agents living in the same process: `publish` calls the callbacks of the topic right away, on the publisher's thread,
+    with the message object itself - no serialization, no copy, no network. It is also a network-free test harness.
+
+    Callbacks run one after the other, in subscription order; one raising an exception does not keep the others from the message.
+    Published without a codec, a message never leaves the process: every subscriber gets the published object as it is.
+    Published with one, it is encoded once, and each subscriber gets what it would get from the other transports:
+    decoded by the codec of its subscription - once per codec - or the payload bytes, without one.
+    A callback publishing in turn gets its message delivered before `publish` returns, as a nested call.
+    Subscribing is thread-safe, and does not hold up messages being delivered.
+    """
+
+    def __init__(self, log_messages=True):
+        """
+        :param log_messages: print a line for every message delivered, like `BrokerWrapper`. Turn off for high message rates.
+        """
+        self.name = 'InProcessTransport'
+        self.log_messages = log_messages
+        # topic -> tuple of subscriptions; replaced, never mutated, so that publishing needs no lock.
+        self.topics: dict[str, tuple[Subscription, ...]] = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, subscription=None):
+        if subscription is None or not isinstance(subscription, Subscription):
+            raise ValueError("Subscription must be a Subscription object")
+        with self.lock:
+            self.topics[subscription.topic] = self.topics.get(subscription.topic, ()) + (subscription,)
+        return None
+
+    def publish(self, topic, message, codec=None):
+        if self.log_messages:
+            print(f"Received a message on topic {topic}")
+        subscriptions = self.topics.get(topic)
+        if not subscriptions:
+            if self.log_messages:
+                print(f"Warning: No subscriptions found for topic {topic}")
+            return None
+        if codec is None:
+            deliveries = ((subscription, message) for subscription in subscriptions)
+        else:
+            deliveries = decoded_messages(subscriptions, codec.encode(message))
+        for subscription, delivered in deliveries:
+            try:
+                subscription.callback(delivered)
+            except Exception:
+                traceback.print_exc()
+        return None
+
+
+def make_transport(kind=TRANSPORT_MQTT, **options):
+    """
+    the transport of the given kind, one of TRANSPORTS, created with the given options.
+    paho is only imported for MQTT, so the other transports work without it.
+    """
+    if kind not in TRANSPORTS:
+        raise ValueError(f"kind must be one of {TRANSPORTS}, got {kind}")
+    if kind == TRANSPORT_IN_PROCESS:
+        return InProcessTransport(**options)
+    if kind == TRANSPORT_SHARED_MEMORY:
+        from .shared_memory_transport import SharedMemoryTransport
+        return SharedMemoryTransport(**options)
+    from .brokerwrapper import BrokerWrapper
+    return BrokerWrapper(**options)